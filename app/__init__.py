@@ -15,11 +15,15 @@ def create_app():
     with app.app_context():
         from . import models  # registra modelos (incluye User)
         from .models import User
+        from . import versiones  # registra eventos de invalidación de caches
 
         # Registrar blueprints usando el nuevo sistema modular
         from .routes import register_blueprints
         register_blueprints(app)
 
+        from .commands import register_commands
+        register_commands(app)
+
         @login_manager.user_loader
         def load_user(user_id: str):
             return User.query.get(int(user_id))
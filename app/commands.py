@@ -0,0 +1,95 @@
+# commands.py - Comandos de línea (flask <grupo> <comando>)
+import click
+from flask.cli import AppGroup
+
+pdf_cli = AppGroup("pdf", help="Cache de PDFs y trabajos de render.")
+reportes_cli = AppGroup("reportes", help="Reportes diarios de operarios.")
+
+
+@pdf_cli.command("limpiar-cache")
+@click.option("--todo", is_flag=True, help="Vaciar el cache completo.")
+@click.option("--max-mb", type=int, default=None, help="Límite a aplicar (default PDF_CACHE_MAX_MB).")
+def pdf_limpiar_cache(todo, max_mb):
+    """Aplica el límite LRU del cache de PDFs y purga trabajos vencidos."""
+    from .routes import pdf_cache
+    from .routes.pdf_jobs import purgar_trabajos_viejos
+
+    max_bytes = max_mb * 1024 * 1024 if max_mb is not None else None
+    borrados, liberados = pdf_cache.limpiar(max_bytes=max_bytes, todo=todo)
+    trabajos = purgar_trabajos_viejos()
+    stats = pdf_cache.estadisticas()
+
+    click.echo(f"PDFs borrados: {borrados} ({liberados / 1024 / 1024:.1f} MB liberados)")
+    click.echo(f"Trabajos vencidos borrados: {trabajos}")
+    click.echo(f"Cache: {stats['archivos']} archivos, {stats['bytes'] / 1024 / 1024:.1f} MB en {stats['dir']}")
+
+
+@pdf_cli.command("paquete")
+@click.option("--fecha", required=True, help="Día a imprimir (YYYY-MM-DD).")
+@click.option("--salida", default=None, help="Archivo destino (default SOP_dia_<fecha>.<formato>).")
+@click.option("--formato", type=click.Choice(["zip", "pdf"]), default="zip")
+def pdf_paquete(fecha, salida, formato):
+    """PDFs del día de todo el personal en un zip (o un PDF unido)."""
+    from datetime import datetime
+    from .routes.pdf_paquete import preparar_partes, stream_zip, pdf_unido
+
+    try:
+        fecha_obj = datetime.strptime(fecha, "%Y-%m-%d").date()
+    except ValueError:
+        raise click.BadParameter("Formato esperado: YYYY-MM-DD", param_hint="--fecha")
+
+    partes = preparar_partes(fecha_obj)
+    if not partes:
+        raise click.ClickException(f"No hay tareas para el {fecha}.")
+
+    salida = salida or f"SOP_dia_{fecha}.{formato}"
+    click.echo(f"Generando {len(partes)} PDFs...")
+
+    with open(salida, "wb") as f:
+        if formato == "pdf":
+            f.write(pdf_unido(partes))
+        else:
+            for trozo in stream_zip(partes):
+                f.write(trozo)
+
+    click.echo(f"Listo: {salida}")
+
+
+@reportes_cli.command("precalentar")
+@click.option("--fecha", default=None, help="Día a precalentar (YYYY-MM-DD, default mañana).")
+def reportes_precalentar(fecha):
+    """Genera al cache de PDFs el reporte de cada operario (no calienta caches en memoria)."""
+    from datetime import datetime, timedelta
+    from .routes.helpers import today_cdmx, pdfkit, PDFKIT_CONFIG
+    from .routes.precalentar import precalentar_dia, EnCurso
+
+    if fecha:
+        try:
+            fecha_obj = datetime.strptime(fecha, "%Y-%m-%d").date()
+        except ValueError:
+            raise click.BadParameter("Formato esperado: YYYY-MM-DD", param_hint="--fecha")
+    else:
+        fecha_obj = today_cdmx() + timedelta(days=1)
+
+    if pdfkit is None or PDFKIT_CONFIG is None:
+        raise click.ClickException("wkhtmltopdf no está disponible; no hay PDFs que precalentar.")
+
+    try:
+        r = precalentar_dia(fecha_obj)
+    except EnCurso:
+        raise click.ClickException("Ya hay un precalentado en curso.")
+    if not r["existe"]:
+        raise click.ClickException(f"No existe un registro de día para la fecha {r['fecha']}.")
+
+    click.echo(
+        f"{r['fecha']}: {r['personas']} operarios, "
+        f"{r['pdf_generados']} PDFs generados, {r['pdf_en_cache']} ya en cache ({r['segundos']}s)"
+    )
+    for error in r["pdf_errores"]:
+        click.echo(f"  Error: {error}", err=True)
+
+
+def register_commands(app):
+    """Registra los grupos de comandos en la app."""
+    app.cli.add_command(pdf_cli)
+    app.cli.add_command(reportes_cli)
@@ -972,3 +972,19 @@ class InstructivoRelacion(db.Model):
     tmo = db.relationship("TMO", back_populates="relaciones")
     herramienta_uso = db.relationship("HerramientaUso", back_populates="relaciones")
     ficha_receta = db.relationship("FichaReceta", back_populates="relaciones")
+
+
+# ======================================================
+# 16. VERSIONES DE CONTENIDO (invalidación de caches de reportes)
+# ======================================================
+
+class ContenidoVersion(db.Model):
+    __tablename__ = 'contenido_version'
+
+    # Claves: 'sop:<sop_id>', 'sop_evento:<sop_evento_id>' o 'catalogo'
+    clave = db.Column(db.String(120), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    actualizado_en = db.Column(db.DateTime, default=now_cdmx)
+
+    def __repr__(self):
+        return f"<ContenidoVersion {self.clave}={self.version}>"
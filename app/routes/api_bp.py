@@ -1,6 +1,11 @@
 # api_bp.py - Blueprint para APIs de catalogos y operaciones
-from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash, make_response
 from flask_login import login_required, current_user
+from sqlalchemy import delete, insert
 from sqlalchemy.exc import IntegrityError
 
 from ..models import (
@@ -14,11 +19,16 @@ from ..models import (
     Kit, KitDetalle, Herramienta,
     Receta, RecetaDetalle, Quimico, Consumo,
     SopFraccion, SopFraccionDetalle,
+    PlantillaSemanal,
 )
-from .helpers import admin_required, now_cdmx, today_cdmx
+from .helpers import admin_required, now_cdmx, today_cdmx, etag_condicional, aplicar_etag, MEXICO_TZ
+from .reportes_data import reporte_compacto, paquete_offline, huella_dia_persona, API_REPORTE_VERSION
+from .carga import matriz_semana, simular_semanas, tablero_semana, conteos_rango, semana_operario
 
 api_bp = Blueprint("api", __name__)
 
+CHECKS_LOTE_MAX = int(os.getenv("CHECKS_LOTE_MAX", "500"))
+
 
 # =========================
 # API - QUIMICOS (CRUD)
@@ -1558,6 +1568,318 @@ def desmarcar_tarea_check(tarea_id):
     return {"success": True}, 200
 
 
+def _hora_cliente(valor, ahora):
+    """
+    Hora del check según el dispositivo (epoch en ms o ISO 8601) en hora CDMX
+    naive. Si falta, no se entiende, es de otro día o del futuro: `ahora`.
+    """
+    try:
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            hora = datetime.fromtimestamp(valor / 1000, MEXICO_TZ).replace(tzinfo=None)
+        elif isinstance(valor, str) and valor:
+            hora = datetime.fromisoformat(valor.replace("Z", "+00:00"))
+            if hora.tzinfo is not None:
+                hora = hora.astimezone(MEXICO_TZ).replace(tzinfo=None)
+        else:
+            return ahora
+    except (ValueError, OverflowError, OSError):
+        return ahora
+
+    if hora.date() != ahora.date() or hora > ahora:
+        return ahora
+    return hora
+
+
+@api_bp.route("/api/tareas/checks", methods=["POST"])
+@login_required
+def sincronizar_checks():
+    """
+    Aplica en lote los checks hechos sin conexión.
+    Body: {"checks": [{"tarea_id", "action": "marcar"|"desmarcar", "client_timestamp"}]}
+    Por tarea gana la última acción (por client_timestamp); repetir un lote no
+    cambia nada. Retorna el mapa de checks del día del operario.
+    """
+    if current_user.role == "admin" or not current_user.personal_id:
+        return jsonify({"error": "Solo para personal operativo"}), 403
+
+    data = request.get_json(silent=True) or {}
+    items = data.get("checks")
+    if not isinstance(items, list):
+        return jsonify({"error": "Se espera 'checks' como lista"}), 400
+    if len(items) > CHECKS_LOTE_MAX:
+        return jsonify({"error": f"Máximo {CHECKS_LOTE_MAX} checks por lote"}), 400
+
+    ahora = now_cdmx()
+
+    # Estado final deseado por tarea (la última acción del dispositivo)
+    deseado = {}
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            return jsonify({"error": f"Check #{i} inválido"}), 400
+        try:
+            tarea_id = int(item.get("tarea_id"))
+        except (TypeError, ValueError):
+            return jsonify({"error": f"Check #{i}: tarea_id inválido"}), 400
+        accion = item.get("action")
+        if accion not in ("marcar", "desmarcar"):
+            return jsonify({"error": f"Check #{i}: action debe ser 'marcar' o 'desmarcar'"}), 400
+        hora = _hora_cliente(item.get("client_timestamp"), ahora)
+        if tarea_id not in deseado or hora >= deseado[tarea_id][1]:
+            deseado[tarea_id] = (accion, hora)
+
+    # Dueño, día y check actual de todo el lote en una query
+    filas = {}
+    if deseado:
+        filas = {
+            r.tarea_id: r
+            for r in db.session.query(
+                LanzamientoTarea.tarea_id,
+                LanzamientoTarea.personal_id,
+                LanzamientoDia.fecha,
+                TareaCheck.checked_at,
+            )
+            .join(LanzamientoDia, LanzamientoDia.dia_id == LanzamientoTarea.dia_id)
+            .outerjoin(TareaCheck, TareaCheck.tarea_id == LanzamientoTarea.tarea_id)
+            .filter(LanzamientoTarea.tarea_id.in_(deseado))
+            .all()
+        }
+
+    hoy = ahora.date()
+    rechazadas = []
+    marcar = []
+    desmarcar = []
+    for tarea_id, (accion, hora) in sorted(deseado.items()):
+        fila = filas.get(tarea_id)
+        if fila is None:
+            rechazadas.append({"tarea_id": tarea_id, "error": "Tarea no encontrada"})
+        elif fila.personal_id != current_user.personal_id:
+            rechazadas.append({"tarea_id": tarea_id, "error": "Esta tarea no te pertenece"})
+        elif fila.fecha != hoy:
+            rechazadas.append({"tarea_id": tarea_id, "error": "Solo puedes modificar tareas de hoy"})
+        elif accion == "marcar" and fila.checked_at is None:
+            marcar.append({"tarea_id": tarea_id, "checked_at": hora, "user_id": current_user.user_id})
+        elif accion == "desmarcar" and fila.checked_at is not None:
+            desmarcar.append(tarea_id)
+
+    # Inserts y deletes en una sola transacción; una tarea que otro request
+    # marcó entre la lectura y el insert se respeta (no hay doble check)
+    if marcar or desmarcar:
+        if desmarcar:
+            db.session.execute(delete(TareaCheck).where(TareaCheck.tarea_id.in_(desmarcar)))
+        if marcar:
+            dialecto = db.session.get_bind().dialect.name
+            if dialecto in ("postgresql", "sqlite"):
+                if dialecto == "postgresql":
+                    from sqlalchemy.dialects.postgresql import insert as dialect_insert
+                else:
+                    from sqlalchemy.dialects.sqlite import insert as dialect_insert
+                stmt = dialect_insert(TareaCheck).on_conflict_do_nothing(index_elements=[TareaCheck.tarea_id])
+            else:
+                stmt = insert(TareaCheck)
+            db.session.execute(stmt, marcar)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"error": "Conflicto al guardar, reintenta"}), 409
+
+    # Mapa resultante del día del operario
+    checks = {
+        str(r.tarea_id): r.checked_at.strftime("%H:%M") if r.checked_at else None
+        for r in db.session.query(LanzamientoTarea.tarea_id, TareaCheck.checked_at)
+        .join(LanzamientoDia, LanzamientoDia.dia_id == LanzamientoTarea.dia_id)
+        .outerjoin(TareaCheck, TareaCheck.tarea_id == LanzamientoTarea.tarea_id)
+        .filter(LanzamientoDia.fecha == hoy, LanzamientoTarea.personal_id == current_user.personal_id)
+        .all()
+    }
+
+    return jsonify({
+        "success": True,
+        "marcadas": len(marcar),
+        "desmarcadas": len(desmarcar),
+        "rechazadas": rechazadas,
+        "checks": checks,
+    })
+
+
+@api_bp.route("/api/mi-semana", methods=["GET"])
+@login_required
+def api_mi_semana():
+    """Tareas del operario de esta semana (Lunes..Sábado) con minutos y check."""
+    if current_user.role == "admin" or not current_user.personal_id:
+        return jsonify({"error": "Solo para personal operativo"}), 403
+
+    return jsonify(semana_operario(today_cdmx(), current_user.personal_id))
+
+
+# ======================================================
+# API v1: Reporte compacto del día (con delta)
+# ======================================================
+@api_bp.route("/api/v1/reporte/<fecha>/<personal_id>", methods=["GET"])
+@login_required
+def api_reporte_compacto(fecha, personal_id):
+    """
+    Tareas, fracciones y checks del día en JSON compacto.
+    ?since=<token> devuelve solo lo que cambió desde ese token.
+    """
+    if current_user.role != "admin":
+        if current_user.personal_id != personal_id:
+            return jsonify({"error": "Sin acceso a este reporte"}), 403
+        if fecha != today_cdmx().strftime("%Y-%m-%d"):
+            return jsonify({"error": "Solo puedes consultar el día de hoy"}), 403
+
+    try:
+        fecha_obj = datetime.strptime(fecha, "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "Fecha inválida, formato esperado: YYYY-MM-DD"}), 400
+
+    dia = LanzamientoDia.query.filter_by(fecha=fecha_obj).first()
+    if not dia:
+        return jsonify({"error": f"No existe un registro de día para la fecha {fecha}"}), 404
+
+    data = reporte_compacto(dia.dia_id, personal_id, since=request.args.get("since"))
+    data.update({"fecha": fecha, "personal_id": personal_id})
+    return jsonify(data)
+
+
+@api_bp.route("/api/v1/paquete/<fecha>/<personal_id>", methods=["GET"])
+@login_required
+def api_paquete_offline(fecha, personal_id):
+    """
+    Paquete del día para modo sin conexión: reporte completo + instructivos en
+    un solo JSON comprimido con gzip. Con If-None-Match responde 304 sin
+    cargar tareas (el service worker revalida así su copia).
+    """
+    if current_user.role != "admin":
+        if current_user.personal_id != personal_id:
+            return jsonify({"error": "Sin acceso a este reporte"}), 403
+        if fecha != today_cdmx().strftime("%Y-%m-%d"):
+            return jsonify({"error": "Solo puedes consultar el día de hoy"}), 403
+
+    try:
+        fecha_obj = datetime.strptime(fecha, "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "Fecha inválida, formato esperado: YYYY-MM-DD"}), 400
+
+    dia = LanzamientoDia.query.filter_by(fecha=fecha_obj).first()
+    if not dia:
+        return jsonify({"error": f"No existe un registro de día para la fecha {fecha}"}), 404
+
+    etag, no_modificado = etag_condicional(
+        "paquete", API_REPORTE_VERSION, personal_id,
+        huella_dia_persona(dia.dia_id, personal_id),
+    )
+    if no_modificado:
+        return no_modificado
+
+    data = paquete_offline(dia.dia_id, personal_id)
+    data.update({"fecha": fecha, "personal_id": personal_id, "version": etag})
+    cuerpo = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    resp = make_response(cuerpo)
+    resp.mimetype = "application/json"
+    if "gzip" in request.accept_encodings:
+        resp.set_data(gzip.compress(cuerpo, compresslevel=6))
+        resp.headers["Content-Encoding"] = "gzip"
+    resp.vary.add("Accept-Encoding")
+    return aplicar_etag(resp, etag)
+
+
+# ======================================================
+# API: Carga de trabajo
+# ======================================================
+@api_bp.route("/api/carga/semana", methods=["GET"])
+@admin_required
+def api_carga_semana():
+    """
+    Matriz personal × día de la semana (minutos, extra y ocio).
+    ?fecha=YYYY-MM-DD (cualquier día de la semana, default hoy), ?capacidad=<min>
+    """
+    fecha_str = request.args.get("fecha")
+    try:
+        fecha_obj = datetime.strptime(fecha_str, "%Y-%m-%d").date() if fecha_str else today_cdmx()
+    except ValueError:
+        return jsonify({"error": "Fecha inválida, formato esperado: YYYY-MM-DD"}), 400
+
+    capacidad = request.args.get("capacidad", type=float)
+    if capacidad is not None and capacidad <= 0:
+        return jsonify({"error": "La capacidad debe ser mayor a 0"}), 400
+
+    return jsonify(matriz_semana(fecha_obj, capacidad))
+
+
+@api_bp.route("/api/carga/simular", methods=["GET"])
+@admin_required
+def api_carga_simular():
+    """
+    Simula aplicar una plantilla (o la ruta base) por varias semanas, sin escribir.
+    ?plantilla_id=<id> (sin él: ruta base), ?lunes=YYYY-MM-DD (default esta semana),
+    ?semanas=N, ?capacidad=<min>, ?conservar=1 (sumar a las tareas existentes)
+    """
+    lunes_str = request.args.get("lunes")
+    try:
+        lunes = datetime.strptime(lunes_str, "%Y-%m-%d").date() if lunes_str else today_cdmx()
+    except ValueError:
+        return jsonify({"error": "Fecha inválida, formato esperado: YYYY-MM-DD"}), 400
+
+    plantilla_id = request.args.get("plantilla_id", type=int)
+    if plantilla_id is not None and not PlantillaSemanal.query.get(plantilla_id):
+        return jsonify({"error": "Plantilla no encontrada"}), 404
+
+    capacidad = request.args.get("capacidad", type=float)
+    if capacidad is not None and capacidad <= 0:
+        return jsonify({"error": "La capacidad debe ser mayor a 0"}), 400
+
+    return jsonify(simular_semanas(
+        lunes,
+        semanas=request.args.get("semanas", default=1, type=int),
+        plantilla_id=plantilla_id,
+        capacidad_min=capacidad,
+        conservar=request.args.get("conservar", default=0, type=int) == 1,
+    ))
+
+
+@api_bp.route("/api/semana/tablero", methods=["GET"])
+@admin_required
+def api_tablero_semana():
+    """
+    Lunes..Sábado en un solo payload: operarios, tareas ordenadas con minutos
+    y check, y totales por día. ?fecha=YYYY-MM-DD (cualquier día de la semana)
+    """
+    fecha_str = request.args.get("fecha")
+    try:
+        fecha_obj = datetime.strptime(fecha_str, "%Y-%m-%d").date() if fecha_str else today_cdmx()
+    except ValueError:
+        return jsonify({"error": "Fecha inválida, formato esperado: YYYY-MM-DD"}), 400
+
+    return jsonify(tablero_semana(fecha_obj))
+
+
+@api_bp.route("/api/calendario/conteos", methods=["GET"])
+@admin_required
+def api_calendario_conteos():
+    """
+    Tareas y personal por día y por semana en un rango.
+    ?mes=YYYY-MM  o  ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD (máx. 400 días)
+    """
+    try:
+        mes = request.args.get("mes")
+        if mes:
+            desde = datetime.strptime(mes, "%Y-%m").date()
+            siguiente = (desde.replace(day=28) + timedelta(days=4)).replace(day=1)
+            hasta = siguiente - timedelta(days=1)
+        else:
+            desde = datetime.strptime(request.args.get("desde", ""), "%Y-%m-%d").date()
+            hasta = datetime.strptime(request.args.get("hasta", ""), "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "Usa ?mes=YYYY-MM o ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD"}), 400
+
+    if hasta < desde or (hasta - desde).days > 400:
+        return jsonify({"error": "Rango inválido (máximo 400 días)"}), 400
+
+    return jsonify(conteos_rango(desde, hasta))
+
+
 # ======================================================
 # API: Verificar SOP existe
 # ======================================================
@@ -0,0 +1,669 @@
+# carga.py - Carga de trabajo (minutos) por operario y día
+#
+# Las tareas se leen como filas planas (sin ORM) y los minutos salen del mapa
+# de duraciones cacheado (helpers.tiempos_tareas); la agregación es NumPy.
+# También aquí: reparto automático de subáreas libres de un día, simulación de
+# plantillas, el tablero de la semana y los conteos del panel/calendario.
+import os
+import time
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import insert, func
+
+from .helpers import (
+    get_monday, tiempos_tareas, duraciones_sop, canon_nivel, nivel_to_id, TAREAS_FIJAS,
+)
+from .reportes_data import TIEMPO_FIJO
+from ..extensions import db
+from ..models import (
+    Personal, Area, SubArea, SOP, LanzamientoSemana, LanzamientoDia, LanzamientoTarea, TareaCheck,
+    PlantillaItem, AsignacionPersonal, SopEvento, EventoCatalogo, CasoCatalogo,
+)
+from ..versiones import obtener_versiones, clave_sop
+
+JORNADA_MIN = float(os.getenv("JORNADA_MIN", "480"))
+DIAS_SEMANA = 6  # Lunes..Sábado
+REPARTO_MAX_ITER = int(os.getenv("REPARTO_MAX_ITER", "2000"))
+SIMULAR_MAX_SEMANAS = int(os.getenv("SIMULAR_MAX_SEMANAS", "12"))
+
+
+def _lista(arr):
+    return np.round(arr, 1).tolist()
+
+
+def matriz_semana(fecha, capacidad_min: float = None) -> dict:
+    """
+    Matriz personal × día (Lunes..Sábado) de la semana de `fecha`:
+    minutos totales, horas extra (sobre capacidad) y ocio (bajo capacidad,
+    solo en días con tareas). Número fijo de queries sin importar cuántas tareas haya.
+    """
+    capacidad = float(capacidad_min if capacidad_min is not None else JORNADA_MIN)
+    lunes = get_monday(fecha)
+    sabado = lunes + timedelta(days=DIAS_SEMANA - 1)
+
+    filas = (
+        db.session.query(
+            LanzamientoTarea.tarea_id,
+            LanzamientoTarea.personal_id,
+            LanzamientoTarea.tipo_tarea,
+            LanzamientoTarea.subarea_id,
+            LanzamientoTarea.sop_id,
+            LanzamientoTarea.sop_evento_id,
+            LanzamientoTarea.nivel_limpieza_asignado,
+            LanzamientoDia.fecha,
+        )
+        .join(LanzamientoDia, LanzamientoDia.dia_id == LanzamientoTarea.dia_id)
+        .filter(LanzamientoDia.fecha >= lunes, LanzamientoDia.fecha <= sabado)
+        .all()
+    )
+    minutos = tiempos_tareas(filas)
+
+    personal = db.session.query(Personal.personal_id, Personal.nombre).order_by(Personal.nombre).all()
+    idx_persona = {p.personal_id: i for i, p in enumerate(personal)}
+
+    n = len(filas)
+    p_idx = np.fromiter((idx_persona[f.personal_id] for f in filas), dtype=np.intp, count=n)
+    d_idx = np.fromiter(((f.fecha - lunes).days for f in filas), dtype=np.intp, count=n)
+    mins = np.fromiter((float(minutos[f.tarea_id]) for f in filas), dtype=np.float64, count=n)
+
+    totales = np.zeros((len(personal), DIAS_SEMANA))
+    conteo = np.zeros((len(personal), DIAS_SEMANA), dtype=np.int64)
+    np.add.at(totales, (p_idx, d_idx), mins)
+    np.add.at(conteo, (p_idx, d_idx), 1)
+
+    extra = np.maximum(totales - capacidad, 0)
+    ocio = np.where(conteo > 0, np.maximum(capacidad - totales, 0), 0)
+
+    return {
+        "lunes": lunes.strftime("%Y-%m-%d"),
+        "fechas": [(lunes + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(DIAS_SEMANA)],
+        "capacidad_min": capacidad,
+        "personal": [{"personal_id": p.personal_id, "nombre": p.nombre} for p in personal],
+        "totales": _lista(totales),
+        "extra": _lista(extra),
+        "ocio": _lista(ocio),
+        "tareas": conteo.tolist(),
+        "por_dia": {
+            "total": _lista(totales.sum(axis=0)),
+            "extra": _lista(extra.sum(axis=0)),
+            "ocio": _lista(ocio.sum(axis=0)),
+            "max": _lista(totales.max(axis=0)) if len(personal) else [0] * DIAS_SEMANA,
+            "operarios": (conteo > 0).sum(axis=0).tolist(),
+        },
+        "por_persona": {
+            "total": _lista(totales.sum(axis=1)),
+            "extra": _lista(extra.sum(axis=1)),
+            "ocio": _lista(ocio.sum(axis=1)),
+        },
+    }
+
+
+# =========================
+# Conteos por rango de fechas
+# =========================
+def conteos_por_fecha(desde, hasta) -> dict:
+    """{fecha: {"tareas": n, "personas": n}} de los días con tareas; un GROUP BY."""
+    filas = (
+        db.session.query(
+            LanzamientoDia.fecha,
+            func.count(LanzamientoTarea.tarea_id),
+            func.count(func.distinct(LanzamientoTarea.personal_id)),
+        )
+        .join(LanzamientoTarea, LanzamientoTarea.dia_id == LanzamientoDia.dia_id)
+        .filter(LanzamientoDia.fecha >= desde, LanzamientoDia.fecha <= hasta)
+        .group_by(LanzamientoDia.fecha)
+        .all()
+    )
+    return {fecha: {"tareas": tareas, "personas": personas} for fecha, tareas, personas in filas}
+
+
+def conteos_rango(desde, hasta) -> dict:
+    """
+    Conteos de tareas y personal para un rango (calendario): por día y por
+    semana (personal distinto en la semana). Dos queries sin importar el rango.
+    """
+    por_fecha = conteos_por_fecha(desde, hasta)
+
+    semanas = (
+        db.session.query(
+            LanzamientoSemana.fecha_inicio,
+            func.count(LanzamientoTarea.tarea_id),
+            func.count(func.distinct(LanzamientoTarea.personal_id)),
+        )
+        .join(LanzamientoDia, LanzamientoDia.semana_id == LanzamientoSemana.semana_id)
+        .join(LanzamientoTarea, LanzamientoTarea.dia_id == LanzamientoDia.dia_id)
+        .filter(LanzamientoDia.fecha >= desde, LanzamientoDia.fecha <= hasta)
+        .group_by(LanzamientoSemana.fecha_inicio)
+        .order_by(LanzamientoSemana.fecha_inicio)
+        .all()
+    )
+
+    return {
+        "desde": desde.strftime("%Y-%m-%d"),
+        "hasta": hasta.strftime("%Y-%m-%d"),
+        "dias": [
+            {"fecha": fecha.strftime("%Y-%m-%d"), **conteo}
+            for fecha, conteo in sorted(por_fecha.items())
+        ],
+        "semanas": [
+            {"lunes": lunes.strftime("%Y-%m-%d"), "tareas": tareas, "personas": personas}
+            for lunes, tareas, personas in semanas
+        ],
+        "total_tareas": sum(c["tareas"] for c in por_fecha.values()),
+    }
+
+
+# =========================
+# Reparto automático (LPT + búsqueda local)
+# =========================
+def repartir(duraciones, cargas, capacidades, max_iter: int = REPARTO_MAX_ITER):
+    """
+    Reparte trabajos entre operarios minimizando la utilización máxima
+    (carga / capacidad). `cargas` son los minutos que cada operario ya tiene.
+
+    1) LPT: de mayor a menor duración, cada trabajo va al operario que quede
+       menos utilizado.
+    2) Búsqueda local: mientras mejore, mueve un trabajo del operario más
+       utilizado a otro, o lo intercambia por uno más corto de otro.
+
+    Retorna (operario de cada trabajo, carga final por operario).
+    """
+    p = np.asarray(duraciones, dtype=np.float64)
+    carga = np.array(cargas, dtype=np.float64)
+    cap = np.asarray(capacidades, dtype=np.float64)
+    asignacion = np.empty(len(p), dtype=np.intp)
+
+    for j in np.argsort(-p, kind="stable"):
+        k = int(np.argmin((carga + p[j]) / cap))
+        asignacion[j] = k
+        carga[k] += p[j]
+
+    for _ in range(max_iter):
+        util = carga / cap
+        b = int(np.argmax(util))
+        mios = np.flatnonzero(asignacion == b)
+        if not len(mios):
+            break
+
+        # Mover j (de b) a k: peor utilización entre b y k después del cambio
+        mover = np.maximum(
+            ((carga[b] - p[mios]) / cap[b])[:, None],
+            (carga[None, :] + p[mios][:, None]) / cap[None, :],
+        )
+        mover[:, b] = np.inf
+        jm, km = np.unravel_index(np.argmin(mover), mover.shape)
+
+        # Intercambiar j (de b) por i (de otro operario)
+        otros = np.flatnonzero(asignacion != b)
+        mejor_swap = np.inf
+        if len(otros):
+            d = p[mios][:, None] - p[otros][None, :]
+            k_otros = asignacion[otros]
+            cambiar = np.maximum((carga[b] - d) / cap[b], (carga[k_otros][None, :] + d) / cap[k_otros][None, :])
+            js, io = np.unravel_index(np.argmin(cambiar), cambiar.shape)
+            mejor_swap = cambiar[js, io]
+
+        if min(mover[jm, km], mejor_swap) >= util[b] - 1e-9:
+            break
+
+        if mover[jm, km] <= mejor_swap:
+            j = mios[jm]
+            asignacion[j] = km
+            carga[b] -= p[j]
+            carga[km] += p[j]
+        else:
+            j, i = mios[js], otros[io]
+            k = asignacion[i]
+            asignacion[j], asignacion[i] = k, b
+            carga[b] += p[i] - p[j]
+            carga[k] += p[j] - p[i]
+
+    return asignacion, carga
+
+
+def plan_reparto(dia_id: int, nivel: str, capacidades: dict, subarea_ids=None) -> dict:
+    """
+    Arma el reparto de las subáreas sin tarea regular en el día entre los
+    operarios de `capacidades` ({personal_id: minutos}). Las tareas que ya
+    tienen cuentan como carga fija. Con dia_id None (el día aún no existe)
+    no hay carga previa. No escribe nada.
+    """
+    inicio = time.monotonic()
+    nivel_id = nivel_to_id(nivel)
+
+    filas = [] if dia_id is None else (
+        db.session.query(
+            LanzamientoTarea.tarea_id,
+            LanzamientoTarea.personal_id,
+            LanzamientoTarea.tipo_tarea,
+            LanzamientoTarea.subarea_id,
+            LanzamientoTarea.sop_id,
+            LanzamientoTarea.sop_evento_id,
+            LanzamientoTarea.nivel_limpieza_asignado,
+            LanzamientoTarea.es_adicional,
+        )
+        .filter(LanzamientoTarea.dia_id == dia_id)
+        .all()
+    )
+    minutos = tiempos_tareas(filas)
+
+    # Subáreas ocupadas: tarea regular o su SOP regular ya usado (extraordinario)
+    sops_usados = {f.sop_id for f in filas if f.sop_id}
+    subareas_regulares = {f.subarea_id for f in filas if f.tipo_tarea == 'sop' and not f.es_adicional}
+
+    q = (
+        db.session.query(
+            SOP.sop_id, SubArea.subarea_id, SubArea.subarea_nombre, SubArea.orden_subarea,
+            Area.area_id, Area.area_nombre, Area.orden_area,
+        )
+        .join(SubArea, SubArea.subarea_id == SOP.subarea_id)
+        .join(Area, Area.area_id == SubArea.area_id)
+        .filter(SOP.tipo_sop == 'regular')
+    )
+    if subarea_ids is not None:
+        q = q.filter(SubArea.subarea_id.in_(list(subarea_ids)))
+    libres = [
+        c for c in q.all()
+        if c.sop_id not in sops_usados and c.subarea_id not in subareas_regulares
+    ]
+
+    versiones = obtener_versiones([clave_sop(c.sop_id) for c in libres])
+    por_sop = duraciones_sop({c.sop_id for c in libres}, versiones)
+    duraciones = [por_sop.get(c.sop_id, {}).get(nivel_id, 0) for c in libres]
+
+    personal = (
+        db.session.query(Personal.personal_id, Personal.nombre)
+        .filter(Personal.personal_id.in_(list(capacidades)))
+        .order_by(Personal.nombre)
+        .all()
+    )
+    con_fijas = {f.personal_id for f in filas if f.tipo_tarea in ('inicio', 'receso')}
+
+    ya_asignado = {}
+    for f in filas:
+        ya_asignado[f.personal_id] = ya_asignado.get(f.personal_id, 0.0) + float(minutos[f.tarea_id])
+    # A quien no tiene fijas se le crean al recibir trabajo (cuenta su receso)
+    cargas_fijas = [
+        ya_asignado.get(p.personal_id, 0.0) + (0 if p.personal_id in con_fijas else TIEMPO_FIJO['receso'])
+        for p in personal
+    ]
+
+    resultado = {
+        "nivel": nivel,
+        "asignaciones": [],
+        "operarios": [],
+        "utilizacion_max": 0.0,
+    }
+    if not personal:
+        resultado["sin_asignar"] = [c.subarea_id for c in libres]
+        return resultado
+
+    caps = [capacidades[p.personal_id] for p in personal]
+    asignacion, cargas = repartir(duraciones, cargas_fijas, caps)
+    nuevas = np.bincount(asignacion, minlength=len(personal))
+    for i, c in sorted(enumerate(libres), key=lambda x: (x[1].orden_area or 0, x[1].orden_subarea or 0, x[1].subarea_id)):
+        p = personal[asignacion[i]]
+        resultado["asignaciones"].append({
+            "personal_id": p.personal_id,
+            "area_id": c.area_id,
+            "area": c.area_nombre,
+            "subarea_id": c.subarea_id,
+            "subarea": c.subarea_nombre,
+            "sop_id": c.sop_id,
+            "minutos": round(duraciones[i], 1),
+        })
+
+    for k, p in enumerate(personal):
+        resultado["operarios"].append({
+            "personal_id": p.personal_id,
+            "nombre": p.nombre,
+            "capacidad_min": caps[k],
+            "carga_fija": round(cargas_fijas[k], 1),
+            "carga": round(float(cargas[k]), 1),
+            "utilizacion": round(float(cargas[k]) / caps[k], 3),
+            "tareas_nuevas": int(nuevas[k]),
+            "crear_fijas": p.personal_id not in con_fijas,
+        })
+    resultado["utilizacion_max"] = max(o["utilizacion"] for o in resultado["operarios"])
+    resultado["segundos"] = round(time.monotonic() - inicio, 3)
+    return resultado
+
+
+def aplicar_reparto(dia_id: int, plan: dict) -> int:
+    """Inserta en bloque las tareas del plan (y las fijas que falten). Retorna tareas creadas."""
+    filas = [
+        {
+            "dia_id": dia_id,
+            "personal_id": a["personal_id"],
+            "area_id": a["area_id"],
+            "subarea_id": a["subarea_id"],
+            "sop_id": a["sop_id"],
+            "nivel_limpieza_asignado": plan["nivel"],
+            "es_adicional": False,
+            "orden": 0,
+            "tipo_tarea": 'sop',
+            "es_arrastrable": True,
+        }
+        for a in plan["asignaciones"]
+    ]
+    if not filas:
+        return 0
+
+    for o in plan["operarios"]:
+        if o["crear_fijas"] and o["tareas_nuevas"]:
+            filas.extend(
+                {
+                    "dia_id": dia_id, "personal_id": o["personal_id"],
+                    "area_id": None, "subarea_id": None, "sop_id": None,
+                    "nivel_limpieza_asignado": None, "es_adicional": False,
+                    **fija,
+                }
+                for fija in TAREAS_FIJAS
+            )
+
+    db.session.execute(insert(LanzamientoTarea), filas)
+    db.session.commit()
+    return len(plan["asignaciones"])
+
+
+# =========================
+# Simulación de plantillas (solo lectura)
+# =========================
+def _items_origen(plantilla_id=None):
+    """
+    Items (dia_index, personal_id, subarea_id, sop_id, nivel, es_adicional) de una
+    PlantillaSemanal, o de la ruta base (AsignacionPersonal, Lunes..Sábado) si no
+    se indica plantilla. Sin sop_id se usa el SOP regular de la subárea.
+    """
+    if plantilla_id is not None:
+        filas = (
+            db.session.query(
+                PlantillaItem.dia_index, PlantillaItem.personal_id, PlantillaItem.subarea_id,
+                PlantillaItem.sop_id, PlantillaItem.nivel_limpieza_asignado, PlantillaItem.es_adicional,
+            )
+            .filter(PlantillaItem.plantilla_id == plantilla_id)
+            .all()
+        )
+        items = [(f.dia_index, f.personal_id, f.subarea_id, f.sop_id, f.nivel_limpieza_asignado, bool(f.es_adicional)) for f in filas]
+    else:
+        base = db.session.query(
+            AsignacionPersonal.personal_id, AsignacionPersonal.subarea_id, AsignacionPersonal.nivel_limpieza_asignado,
+        ).all()
+        items = [(d, b.personal_id, b.subarea_id, None, b.nivel_limpieza_asignado, False) for d in range(DIAS_SEMANA) for b in base]
+
+    sin_sop = {it[2] for it in items if not it[3]}
+    regulares = {}
+    if sin_sop:
+        regulares = dict(
+            db.session.query(SOP.subarea_id, SOP.sop_id)
+            .filter(SOP.subarea_id.in_(list(sin_sop)), SOP.tipo_sop == 'regular')
+            .all()
+        )
+    return [
+        (d, pid, sub, sop_id or regulares.get(sub), canon_nivel(nivel) or "basica", adicional)
+        for d, pid, sub, sop_id, nivel, adicional in items
+        if 0 <= d < DIAS_SEMANA
+    ]
+
+
+def simular_semanas(lunes, semanas: int = 1, plantilla_id=None, capacidad_min: float = None,
+                    conservar: bool = False) -> dict:
+    """
+    Expande una plantilla (o la ruta base) sobre `semanas` semanas a partir de
+    `lunes` y calcula la carga por operario y día, sin escribir nada.
+
+    conservar=False simula aplicar borrando la semana (como "Aplicar plantilla");
+    con True se suma a las tareas que ya existen y se omiten las repetidas.
+    Incluye el receso de cada operario con trabajo en el día.
+    """
+    capacidad = float(capacidad_min if capacidad_min is not None else JORNADA_MIN)
+    lunes = get_monday(lunes)
+    semanas = max(1, min(int(semanas), SIMULAR_MAX_SEMANAS))
+    fin = lunes + timedelta(days=7 * (semanas - 1) + DIAS_SEMANA - 1)
+
+    items = _items_origen(plantilla_id)
+    versiones = obtener_versiones([clave_sop(it[3]) for it in items if it[3]])
+    por_sop = duraciones_sop({it[3] for it in items if it[3]}, versiones)
+    minutos_item = np.array(
+        [por_sop.get(it[3], {}).get(nivel_to_id(it[4]), 0) if it[3] else 0 for it in items],
+        dtype=np.float64,
+    )
+
+    existentes = []
+    if conservar:
+        existentes = (
+            db.session.query(
+                LanzamientoTarea.tarea_id,
+                LanzamientoTarea.personal_id,
+                LanzamientoTarea.tipo_tarea,
+                LanzamientoTarea.subarea_id,
+                LanzamientoTarea.sop_id,
+                LanzamientoTarea.sop_evento_id,
+                LanzamientoTarea.nivel_limpieza_asignado,
+                LanzamientoDia.fecha,
+            )
+            .join(LanzamientoDia, LanzamientoDia.dia_id == LanzamientoTarea.dia_id)
+            .filter(LanzamientoDia.fecha >= lunes, LanzamientoDia.fecha <= fin)
+            .all()
+        )
+    minutos = tiempos_tareas(existentes)
+
+    ids = sorted({it[1] for it in items} | {f.personal_id for f in existentes})
+    personal = (
+        db.session.query(Personal.personal_id, Personal.nombre)
+        .filter(Personal.personal_id.in_(ids))
+        .order_by(Personal.nombre)
+        .all()
+    ) if ids else []
+    idx_persona = {p.personal_id: i for i, p in enumerate(personal)}
+
+    n_p = len(personal)
+    cargas = np.zeros((semanas, n_p, DIAS_SEMANA))
+    con_fijas = np.zeros((semanas, n_p, DIAS_SEMANA), dtype=bool)
+
+    # Tareas existentes (conservar=True)
+    usadas = set()
+    if existentes:
+        w = np.fromiter(((f.fecha - lunes).days // 7 for f in existentes), dtype=np.intp, count=len(existentes))
+        d = np.fromiter(((f.fecha - lunes).days % 7 for f in existentes), dtype=np.intp, count=len(existentes))
+        p = np.fromiter((idx_persona[f.personal_id] for f in existentes), dtype=np.intp, count=len(existentes))
+        m = np.fromiter((float(minutos[f.tarea_id]) for f in existentes), dtype=np.float64, count=len(existentes))
+        ok = d < DIAS_SEMANA
+        np.add.at(cargas, (w[ok], p[ok], d[ok]), m[ok])
+        fijas = np.array([f.tipo_tarea in ('inicio', 'receso') for f in existentes]) & ok
+        con_fijas[w[fijas], p[fijas], d[fijas]] = True
+        usadas = {(f.fecha, f.subarea_id, f.sop_id) for f in existentes}
+
+    # Items de la plantilla, semana por semana (mismo criterio de duplicados que al aplicar)
+    if items:
+        p_it = np.array([idx_persona[it[1]] for it in items], dtype=np.intp)
+        d_it = np.array([it[0] for it in items], dtype=np.intp)
+        consecuente = np.array([it[5] and bool(it[3]) and '-C' in it[3] for it in items])
+        for w in range(semanas):
+            lunes_w = lunes + timedelta(days=7 * w)
+            if usadas:
+                nuevo = np.array([
+                    consecuente[k] or (lunes_w + timedelta(days=it[0]), it[2], it[3]) not in usadas
+                    for k, it in enumerate(items)
+                ])
+            else:
+                nuevo = np.ones(len(items), dtype=bool)
+            np.add.at(cargas[w], (p_it[nuevo], d_it[nuevo]), minutos_item[nuevo])
+            nuevos_dia = np.zeros((n_p, DIAS_SEMANA), dtype=bool)
+            nuevos_dia[p_it[nuevo], d_it[nuevo]] = True
+            # Receso de quien recibe trabajo nuevo y aún no tiene fijas
+            cargas[w] += np.where(nuevos_dia & ~con_fijas[w], TIEMPO_FIJO['receso'], 0)
+
+    sobrecarga = cargas > capacidad
+    extra = np.maximum(cargas - capacidad, 0)
+
+    return {
+        "origen": "plantilla" if plantilla_id is not None else "ruta_base",
+        "plantilla_id": plantilla_id,
+        "conservar": conservar,
+        "capacidad_min": capacidad,
+        "items": len(items),
+        "personal": [{"personal_id": p.personal_id, "nombre": p.nombre} for p in personal],
+        "semanas": [
+            {
+                "lunes": (lunes + timedelta(days=7 * w)).strftime("%Y-%m-%d"),
+                "fechas": [(lunes + timedelta(days=7 * w + d)).strftime("%Y-%m-%d") for d in range(DIAS_SEMANA)],
+                "totales": _lista(cargas[w]),
+                "extra": _lista(extra[w]),
+                "sobrecarga": sobrecarga[w].tolist(),
+                "dias_sobrecarga": int(sobrecarga[w].sum()),
+            }
+            for w in range(semanas)
+        ],
+        "por_persona": {
+            "max": _lista(cargas.max(axis=(0, 2))) if n_p else [],
+            "extra": _lista(extra.sum(axis=(0, 2))),
+            "dias_sobrecarga": sobrecarga.sum(axis=(0, 2)).tolist(),
+        },
+        "dias_sobrecarga": int(sobrecarga.sum()),
+    }
+
+
+# =========================
+# Tablero de la semana
+# =========================
+def tablero_semana(fecha, personal_id: str = None) -> dict:
+    """
+    Semana completa (Lunes..Sábado) para el panel admin: por operario y día,
+    sus tareas en orden con minutos y check, más totales por día.
+    Con personal_id solo ese operario. Número fijo de queries (tareas + tiempos + personal).
+    """
+    lunes = get_monday(fecha)
+    sabado = lunes + timedelta(days=DIAS_SEMANA - 1)
+
+    q = (
+        db.session.query(
+            LanzamientoTarea.tarea_id,
+            LanzamientoTarea.dia_id,
+            LanzamientoTarea.personal_id,
+            LanzamientoTarea.tipo_tarea,
+            LanzamientoTarea.area_id,
+            LanzamientoTarea.subarea_id,
+            LanzamientoTarea.sop_id,
+            LanzamientoTarea.sop_evento_id,
+            LanzamientoTarea.nivel_limpieza_asignado,
+            LanzamientoTarea.es_adicional,
+            LanzamientoTarea.es_arrastrable,
+            LanzamientoTarea.orden,
+            LanzamientoDia.fecha,
+            Area.area_nombre,
+            Area.orden_area,
+            SubArea.subarea_nombre,
+            SubArea.orden_subarea,
+            EventoCatalogo.nombre.label("evento_nombre"),
+            CasoCatalogo.nombre.label("caso_nombre"),
+            TareaCheck.checked_at,
+        )
+        .join(LanzamientoDia, LanzamientoDia.dia_id == LanzamientoTarea.dia_id)
+        .outerjoin(Area, Area.area_id == LanzamientoTarea.area_id)
+        .outerjoin(SubArea, SubArea.subarea_id == LanzamientoTarea.subarea_id)
+        .outerjoin(SopEvento, SopEvento.sop_evento_id == LanzamientoTarea.sop_evento_id)
+        .outerjoin(EventoCatalogo, EventoCatalogo.evento_tipo_id == SopEvento.evento_tipo_id)
+        .outerjoin(CasoCatalogo, CasoCatalogo.caso_id == SopEvento.caso_id)
+        .outerjoin(TareaCheck, TareaCheck.tarea_id == LanzamientoTarea.tarea_id)
+        .filter(LanzamientoDia.fecha >= lunes, LanzamientoDia.fecha <= sabado)
+    )
+    if personal_id is not None:
+        q = q.filter(LanzamientoTarea.personal_id == personal_id)
+    filas = q.all()
+    minutos = tiempos_tareas(filas)
+
+    # Mismo orden que el plan y los reportes: orden, área, subárea
+    filas.sort(key=lambda f: (
+        f.orden or 0,
+        f.orden_area if f.orden_area is not None else 9999,
+        f.orden_subarea if f.orden_subarea is not None else 9999,
+    ))
+
+    qp = db.session.query(Personal.personal_id, Personal.nombre)
+    if personal_id is not None:
+        qp = qp.filter(Personal.personal_id == personal_id)
+    personal = qp.order_by(Personal.nombre).all()
+    fechas = [lunes + timedelta(days=d) for d in range(DIAS_SEMANA)]
+
+    operarios = {
+        p.personal_id: {
+            "personal_id": p.personal_id,
+            "nombre": p.nombre,
+            "dias": [{"min": 0.0, "completadas": 0, "tareas": []} for _ in fechas],
+            "total_min": 0.0,
+        }
+        for p in personal
+    }
+    dias = [
+        {"fecha": f.strftime("%Y-%m-%d"), "dia_id": None, "total_min": 0.0, "tareas": 0, "completadas": 0, "operarios": 0}
+        for f in fechas
+    ]
+
+    for f in filas:
+        d = (f.fecha - lunes).days
+        m = float(minutos[f.tarea_id])
+        check = f.checked_at.strftime("%H:%M") if f.checked_at else None
+
+        celda = operarios[f.personal_id]["dias"][d]
+        celda["tareas"].append({
+            "id": f.tarea_id,
+            "orden": f.orden or 0,
+            "tipo": f.tipo_tarea,
+            "area": f.area_nombre,
+            "subarea": f.subarea_nombre,
+            "evento": f.evento_nombre,
+            "caso": f.caso_nombre,
+            "sop_id": f.sop_id,
+            "nivel": f.nivel_limpieza_asignado,
+            "adicional": bool(f.es_adicional),
+            "arrastrable": bool(f.es_arrastrable),
+            "min": round(m, 1),
+            "check": check,
+        })
+        celda["min"] += m
+        celda["completadas"] += 1 if check else 0
+
+        dia = dias[d]
+        dia["dia_id"] = f.dia_id
+        dia["total_min"] += m
+        dia["tareas"] += 1
+        dia["completadas"] += 1 if check else 0
+
+    for o in operarios.values():
+        for d, celda in enumerate(o["dias"]):
+            celda["min"] = round(celda["min"], 1)
+            o["total_min"] += celda["min"]
+            if celda["tareas"]:
+                dias[d]["operarios"] += 1
+        o["total_min"] = round(o["total_min"], 1)
+    for dia in dias:
+        dia["total_min"] = round(dia["total_min"], 1)
+
+    return {
+        "lunes": lunes.strftime("%Y-%m-%d"),
+        "capacidad_min": JORNADA_MIN,
+        "dias": dias,
+        "operarios": list(operarios.values()),
+    }
+
+
+def semana_operario(fecha, personal_id: str) -> dict:
+    """La semana de un operario: sus tareas por día con minutos y check (vista 'Mi semana')."""
+    tablero = tablero_semana(fecha, personal_id)
+    operario = tablero["operarios"][0] if tablero["operarios"] else {"nombre": None, "dias": [], "total_min": 0.0}
+    dias = operario["dias"] or [{"min": 0.0, "completadas": 0, "tareas": []} for _ in tablero["dias"]]
+
+    return {
+        "lunes": tablero["lunes"],
+        "personal_id": personal_id,
+        "nombre": operario["nombre"],
+        "total_min": operario["total_min"],
+        "total_tareas": sum(len(d["tareas"]) for d in dias),
+        "completadas": sum(d["completadas"] for d in dias),
+        "dias": [
+            {"fecha": info["fecha"], **celda}
+            for info, celda in zip(tablero["dias"], dias)
+        ],
+    }
@@ -1,13 +1,18 @@
 # helpers.py - Funciones compartidas entre blueprints
+import threading
 import unicodedata
+from collections import OrderedDict
 from typing import Optional
 from datetime import datetime, date, timedelta
 from zoneinfo import ZoneInfo
 from functools import wraps
 
-from flask import abort
+from flask import abort, request, session, make_response
 from flask_login import login_required, current_user
 
+from sqlalchemy import func, insert, select, case, delete
+from sqlalchemy.orm import aliased
+
 from ..extensions import db
 from ..models import (
     Area, SubArea, SOP, NivelLimpieza, Personal,
@@ -24,9 +29,11 @@ from ..models import (
     Kit, KitDetalle, Herramienta,
     Receta, RecetaDetalle, Quimico, Consumo,
 )
+from ..versiones import obtener_versiones, clave_sop, clave_sop_evento, CLAVE_CATALOGO
 
 import os
 import shutil
+import hashlib
 
 # =========================
 # Zona Horaria México
@@ -112,14 +119,16 @@ def get_or_create_dia(fecha_obj: date):
     return dia
 
 
+# Tareas fijas de cada operario con trabajo en el día
+TAREAS_FIJAS = [
+    {'tipo_tarea': 'inicio', 'orden': -3, 'sop_evento_id': None, 'es_arrastrable': False},
+    {'tipo_tarea': 'receso', 'orden': 50, 'sop_evento_id': None, 'es_arrastrable': True},
+]
+
+
 def crear_tareas_fijas(dia_id: int, personal_id: str):
     """Crea las 2 tareas fijas para un operario"""
-    tareas_fijas = [
-        {'tipo_tarea': 'inicio', 'orden': -3, 'sop_evento_id': None, 'es_arrastrable': False},
-        {'tipo_tarea': 'receso', 'orden': 50, 'sop_evento_id': None, 'es_arrastrable': True},
-    ]
-
-    for tarea in tareas_fijas:
+    for tarea in TAREAS_FIJAS:
         t = LanzamientoTarea(
             dia_id=dia_id,
             personal_id=personal_id,
@@ -152,6 +161,41 @@ def asegurar_tareas_fijas(dia_id: int, personal_id: str):
     return False
 
 
+def asegurar_tareas_fijas_lote(pares) -> int:
+    """
+    asegurar_tareas_fijas para muchos (dia_id, personal_id) a la vez: un
+    anti-join encuentra los que tienen tareas pero no fijas y un solo INSERT
+    las crea. No hace commit (queda en la transacción del llamador).
+    Las tareas de los pares ya deben estar en la BD (flush).
+    """
+    pares = set(pares)
+    if not pares:
+        return 0
+
+    Fija = aliased(LanzamientoTarea)
+    sin_fijas = db.session.query(
+        LanzamientoTarea.dia_id,
+        LanzamientoTarea.personal_id,
+    ).filter(
+        LanzamientoTarea.dia_id.in_({d for d, _ in pares}),
+        LanzamientoTarea.personal_id.in_({p for _, p in pares}),
+        ~db.exists().where(
+            Fija.dia_id == LanzamientoTarea.dia_id,
+            Fija.personal_id == LanzamientoTarea.personal_id,
+            Fija.tipo_tarea.in_(['inicio', 'receso']),
+        ),
+    ).distinct().all()
+
+    faltan = sorted(pares & {(r.dia_id, r.personal_id) for r in sin_fijas})
+    if faltan:
+        db.session.execute(insert(LanzamientoTarea), [
+            {"dia_id": dia_id, "personal_id": personal_id, **tarea}
+            for dia_id, personal_id in faltan
+            for tarea in TAREAS_FIJAS
+        ])
+    return len(faltan)
+
+
 def set_plantilla_activa(lunes: date, plantilla_id: int = None):
     """Marca o desmarca la plantilla activa de una semana"""
     marca = PlantillaSemanaAplicada.query.get(lunes)
@@ -196,6 +240,18 @@ def canon_nivel(s: Optional[str]) -> Optional[str]:
     return None
 
 
+def canon_nivel_sql(columna, default: str = "basica"):
+    """canon_nivel como expresión SQL (CASE), para copias en lote; `default` si no se reconoce."""
+    x = func.lower(func.trim(columna))
+    return case(
+        (x.in_(("1", "basica", "básica")), "basica"),
+        (x.in_(("2", "media")), "media"),
+        (x.in_(("3", "profundo", "profunda")), "profundo"),
+        (x.in_(("4", "extraordinario", "extraordinaria")), "extraordinario"),
+        else_=default,
+    )
+
+
 def nivel_to_id(s: Optional[str]) -> Optional[int]:
     x = canon_nivel(s or "")
     return {"basica": 1, "media": 2, "profundo": 3, "extraordinario": 4}.get(x)
@@ -212,74 +268,219 @@ def rango_lunes_a_sabado(lunes: date):
     return [lunes + timedelta(days=i) for i in range(6)]
 
 
+def guardar_semana_en_plantilla(plantilla_id: int, lunes: date) -> int:
+    """
+    Copia las tareas SOP de Lunes..Sábado a la plantilla con un solo
+    INSERT ... SELECT (nivel canonizado en SQL). No hace commit.
+    """
+    dias = rango_lunes_a_sabado(lunes)
+    origen = (
+        select(
+            db.literal(plantilla_id),
+            case({f: i for i, f in enumerate(dias)}, value=LanzamientoDia.fecha),
+            LanzamientoTarea.personal_id,
+            LanzamientoTarea.area_id,
+            LanzamientoTarea.subarea_id,
+            LanzamientoTarea.sop_id,
+            canon_nivel_sql(LanzamientoTarea.nivel_limpieza_asignado),
+            func.coalesce(LanzamientoTarea.es_adicional, False),
+            func.coalesce(LanzamientoTarea.orden, 0),
+        )
+        .join(LanzamientoDia, LanzamientoDia.dia_id == LanzamientoTarea.dia_id)
+        .where(
+            LanzamientoDia.fecha.in_(dias),
+            LanzamientoTarea.tipo_tarea == 'sop',
+            LanzamientoTarea.personal_id.isnot(None),
+            LanzamientoTarea.area_id.isnot(None),
+            LanzamientoTarea.subarea_id.isnot(None),
+        )
+        .order_by(LanzamientoDia.fecha, LanzamientoTarea.tarea_id)
+    )
+    res = db.session.execute(
+        insert(PlantillaItem).from_select(
+            ["plantilla_id", "dia_index", "personal_id", "area_id", "subarea_id",
+             "sop_id", "nivel_limpieza_asignado", "es_adicional", "orden"],
+            origen,
+        )
+    )
+    return res.rowcount
+
+
 def borrar_asignaciones_semana(lunes_destino: date):
-    """Borra todas las tareas de la semana"""
-    dias = [lunes_destino + timedelta(days=i) for i in range(6)]
-    for d in dias:
-        dia = LanzamientoDia.query.filter_by(fecha=d).first()
-        if not dia:
-            continue
-        LanzamientoTarea.query.filter_by(dia_id=dia.dia_id).delete()
+    """
+    Borra todas las tareas de la semana (Lunes..Sábado) y sus checks en dos
+    DELETE. Los checks se borran explícitamente: en SQLite el ON DELETE
+    CASCADE no aplica sin PRAGMA foreign_keys.
+    """
+    dias_semana = select(LanzamientoDia.dia_id).where(
+        LanzamientoDia.fecha.between(lunes_destino, lunes_destino + timedelta(days=5))
+    )
+    tareas_semana = select(LanzamientoTarea.tarea_id).where(LanzamientoTarea.dia_id.in_(dias_semana))
+
+    db.session.execute(
+        delete(TareaCheck).where(TareaCheck.tarea_id.in_(tareas_semana)),
+        execution_options={"synchronize_session": False},
+    )
+    db.session.execute(
+        delete(LanzamientoTarea).where(LanzamientoTarea.dia_id.in_(dias_semana)),
+        execution_options={"synchronize_session": False},
+    )
     db.session.commit()
 
 
-def upsert_dia(fecha_obj: date) -> LanzamientoDia:
-    return get_or_create_dia(fecha_obj)
+def dias_semana(lunes: date) -> dict:
+    """{fecha: dia_id} de Lunes..Sábado; crea la semana y los días que falten (flush, sin commit)."""
+    fechas = rango_lunes_a_sabado(lunes)
 
+    semana = LanzamientoSemana.query.filter_by(fecha_inicio=lunes).first()
+    if not semana:
+        semana = LanzamientoSemana(
+            nombre=f"Semana {lunes.isocalendar()[1]}",
+            fecha_inicio=lunes
+        )
+        db.session.add(semana)
+        db.session.flush()
 
-def existe_tarea(fecha_obj: date, personal_id, subarea_id) -> bool:
-    dia = LanzamientoDia.query.filter_by(fecha=fecha_obj).first()
-    if not dia:
-        return False
-    return LanzamientoTarea.query.filter_by(
-        dia_id=dia.dia_id,
-        personal_id=personal_id,
-        subarea_id=subarea_id
-    ).first() is not None
-
-
-def crear_tarea(fecha_obj: date, personal_id, area_id, subarea_id, nivel, orden=0):
-    dia = upsert_dia(fecha_obj)
-    t = LanzamientoTarea(
-        dia_id=dia.dia_id,
-        personal_id=personal_id,
-        area_id=area_id,
-        subarea_id=subarea_id,
-        nivel_limpieza_asignado=canon_nivel(nivel) or "basica",
-        orden=orden
+    dias_map = dict(
+        db.session.query(LanzamientoDia.fecha, LanzamientoDia.dia_id)
+        .filter(LanzamientoDia.fecha.in_(fechas), LanzamientoDia.semana_id == semana.semana_id)
+        .all()
+    )
+    nuevos = [LanzamientoDia(semana_id=semana.semana_id, fecha=f) for f in fechas if f not in dias_map]
+    if nuevos:
+        db.session.add_all(nuevos)
+        db.session.flush()
+        dias_map.update({d.fecha: d.dia_id for d in nuevos})
+    return dias_map
+
+
+def _llaves_tareas(dia_ids) -> set:
+    """{(dia_id, personal_id, subarea_id)} de las tareas ya lanzadas en esos días (una query)."""
+    return set(
+        db.session.query(
+            LanzamientoTarea.dia_id,
+            LanzamientoTarea.personal_id,
+            LanzamientoTarea.subarea_id,
+        ).filter(LanzamientoTarea.dia_id.in_(dia_ids)).all()
     )
-    db.session.add(t)
-    asegurar_tareas_fijas(dia.dia_id, personal_id)
 
 
-def aplicar_ruta_base_personal(lunes_destino: date, overwrite: bool):
+def aplicar_ruta_base_personal(lunes_destino: date, overwrite: bool) -> int:
+    """
+    Expande la ruta base (AsignacionPersonal) en Lunes..Sábado. Carga una vez
+    las llaves (día, personal, subárea) existentes, calcula en memoria las
+    que faltan y las inserta en lote junto con sus tareas fijas.
+    """
     if overwrite:
         borrar_asignaciones_semana(lunes_destino)
 
-    base = AsignacionPersonal.query.all()
-    dias = rango_lunes_a_sabado(lunes_destino)
-    for fecha_obj in dias:
+    base = db.session.query(
+        AsignacionPersonal.personal_id,
+        AsignacionPersonal.area_id,
+        AsignacionPersonal.subarea_id,
+        AsignacionPersonal.nivel_limpieza_asignado,
+    ).order_by(AsignacionPersonal.asignacion_id).all()
+
+    if not base:
+        db.session.commit()
+        return 0
+
+    dias_map = dias_semana(lunes_destino)
+    existentes = _llaves_tareas(dias_map.values())
+
+    filas = []
+    pares = set()
+    for fecha in sorted(dias_map):
+        dia_id = dias_map[fecha]
         for ap in base:
-            if not existe_tarea(fecha_obj, ap.personal_id, ap.subarea_id):
-                crear_tarea(fecha_obj, ap.personal_id, ap.area_id, ap.subarea_id, ap.nivel_limpieza_asignado)
+            llave = (dia_id, ap.personal_id, ap.subarea_id)
+            if llave in existentes:
+                continue
+            existentes.add(llave)
+            pares.add((dia_id, ap.personal_id))
+            filas.append({
+                "dia_id": dia_id,
+                "personal_id": ap.personal_id,
+                "area_id": ap.area_id,
+                "subarea_id": ap.subarea_id,
+                "nivel_limpieza_asignado": canon_nivel(ap.nivel_limpieza_asignado) or "basica",
+                "orden": 0,
+            })
+
+    if filas:
+        db.session.execute(insert(LanzamientoTarea), filas)
+    asegurar_tareas_fijas_lote(pares)
+
     db.session.commit()
+    return len(filas)
 
 
-def aplicar_desde_semana(origen_lunes: date, destino_lunes: date, overwrite: bool):
+def aplicar_desde_semana(origen_lunes: date, destino_lunes: date, overwrite: bool) -> int:
+    """
+    Copia las tareas SOP de una semana a otra (mismo día de la semana) con
+    sop_id, orden y es_adicional. Salta las que ya existen en el destino por
+    (día, subárea, SOP) e inserta todo en lote junto con las tareas fijas.
+    """
     if overwrite:
         borrar_asignaciones_semana(destino_lunes)
 
-    for i in range(6):
-        fecha_origen = origen_lunes + timedelta(days=i)
-        fecha_dest = destino_lunes + timedelta(days=i)
-        dia_origen = LanzamientoDia.query.filter_by(fecha=fecha_origen).first()
-        if not dia_origen:
+    origen = db.session.query(
+        LanzamientoDia.fecha,
+        LanzamientoTarea.personal_id,
+        LanzamientoTarea.area_id,
+        LanzamientoTarea.subarea_id,
+        LanzamientoTarea.sop_id,
+        LanzamientoTarea.nivel_limpieza_asignado,
+        LanzamientoTarea.es_adicional,
+        LanzamientoTarea.orden,
+    ).join(
+        LanzamientoDia, LanzamientoDia.dia_id == LanzamientoTarea.dia_id
+    ).filter(
+        LanzamientoDia.fecha.between(origen_lunes, origen_lunes + timedelta(days=5)),
+        LanzamientoTarea.tipo_tarea == 'sop',
+        LanzamientoTarea.personal_id.isnot(None),
+        LanzamientoTarea.subarea_id.isnot(None),
+    ).order_by(LanzamientoDia.fecha, LanzamientoTarea.tarea_id).all()
+
+    if not origen:
+        db.session.commit()
+        return 0
+
+    dias_map = dias_semana(destino_lunes)
+    existentes = set(
+        db.session.query(
+            LanzamientoTarea.dia_id,
+            LanzamientoTarea.subarea_id,
+            LanzamientoTarea.sop_id,
+        ).filter(LanzamientoTarea.dia_id.in_(dias_map.values())).all()
+    )
+
+    filas = []
+    pares = set()
+    for t in origen:
+        dia_id = dias_map[destino_lunes + (t.fecha - origen_lunes)]
+        llave = (dia_id, t.subarea_id, t.sop_id)
+        if llave in existentes:
             continue
-        tareas = LanzamientoTarea.query.filter_by(dia_id=dia_origen.dia_id).all()
-        for t in tareas:
-            if not existe_tarea(fecha_dest, t.personal_id, t.subarea_id):
-                crear_tarea(fecha_dest, t.personal_id, t.area_id, t.subarea_id, canon_nivel(t.nivel_limpieza_asignado) or "basica")
+        existentes.add(llave)
+        pares.add((dia_id, t.personal_id))
+        filas.append({
+            "dia_id": dia_id,
+            "personal_id": t.personal_id,
+            "area_id": t.area_id,
+            "subarea_id": t.subarea_id,
+            "sop_id": t.sop_id,
+            "nivel_limpieza_asignado": canon_nivel(t.nivel_limpieza_asignado) or "basica",
+            "es_adicional": bool(t.es_adicional),
+            "orden": t.orden or 0,
+        })
+
+    if filas:
+        db.session.execute(insert(LanzamientoTarea), filas)
+    asegurar_tareas_fijas_lote(pares)
+
     db.session.commit()
+    return len(filas)
 
 
 def aplicar_plantilla_guardada(plantilla_id: int, destino_lunes: date, overwrite: bool):
@@ -386,9 +587,11 @@ def aplicar_plantilla_guardada(plantilla_id: int, destino_lunes: date, overwrite
     if tareas_a_insertar:
         db.session.bulk_save_objects(tareas_a_insertar)
 
-    for dia_id, personal_ids in operarios_por_dia.items():
-        for personal_id in personal_ids:
-            asegurar_tareas_fijas(dia_id, personal_id)
+    asegurar_tareas_fijas_lote(
+        (dia_id, personal_id)
+        for dia_id, personal_ids in operarios_por_dia.items()
+        for personal_id in personal_ids
+    )
 
     db.session.commit()
 
@@ -500,37 +703,215 @@ def get_all_areas():
     )
 
 
+# =========================
+# Helpers GET condicional (ETag)
+# =========================
+_version_plantillas = None
+
+
+def version_plantillas() -> str:
+    """mtime más reciente de app/templates: un deploy con cambios de HTML cambia los ETags."""
+    global _version_plantillas
+    if _version_plantillas is None:
+        base = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
+        ultimo = 0.0
+        for raiz, _, archivos in os.walk(base):
+            for nombre in archivos:
+                try:
+                    ultimo = max(ultimo, os.path.getmtime(os.path.join(raiz, nombre)))
+                except OSError:
+                    continue
+        _version_plantillas = str(int(ultimo))
+    return _version_plantillas
+
+
+def etag_condicional(*partes):
+    """
+    Calcula el ETag de una página a partir de sus partes (huella de datos,
+    usuario, etc.). Retorna (etag, respuesta_304 o None).
+    Sin ETag si hay mensajes flash pendientes (la página no sería igual).
+    """
+    if session.get("_flashes"):
+        return None, None
+
+    texto = "|".join(str(p) for p in partes) + "|" + version_plantillas()
+    etag = hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+    if request.if_none_match.contains(etag):
+        return etag, aplicar_etag(make_response("", 304), etag)
+    return etag, None
+
+
+def aplicar_etag(resp, etag):
+    """Pone ETag y obliga a revalidar (privado: depende del usuario)."""
+    resp = make_response(resp)
+    if etag:
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
 # =========================
 # Helper calcular tiempo tarea
 # =========================
-def calcular_tiempo_tarea(tarea):
-    """Calcula el tiempo estimado de una tarea según su tipo."""
-    if tarea.tipo_tarea == 'inicio':
-        return 0
-    elif tarea.tipo_tarea == 'receso':
-        return 45
-    elif tarea.tipo_tarea in ('evento', 'limpieza_equipo'):
-        if tarea.sop_evento and tarea.sop_evento.detalles:
-            return sum(detalle.tiempo_estimado for detalle in tarea.sop_evento.detalles)
-        return 0
-    elif tarea.tipo_tarea == 'sop':
-        if not tarea.sop or not tarea.nivel_limpieza_asignado:
-            return 0
-
-        sop = tarea.sop
-        nivel_id = nivel_to_id(canon_nivel(tarea.nivel_limpieza_asignado))
-        if not nivel_id:
-            return 0
-
-        tiempo_total = 0
-        for sop_fraccion in sop.sop_fracciones or []:
-            detalle = next(
-                (d for d in (sop_fraccion.detalles or []) if d.nivel_limpieza_id == nivel_id),
-                None
+# Duraciones por (sop_id, nivel) y por sop_evento_id calculadas con SUM en la
+# BD y cacheadas por versión de contenido (ver app/versiones.py): cualquier
+# cambio en tiempo_unitario_min / tiempo_estimado cambia la llave.
+DURACION_CACHE_MAX = int(os.getenv("DURACION_CACHE_MAX", "4096"))
+
+_duraciones = OrderedDict()
+_duraciones_lock = threading.Lock()
+
+
+def lru_get(cache, lock, llave):
+    """Valor de un cache LRU (OrderedDict + lock) o None; lo marca como usado."""
+    with lock:
+        valor = cache.get(llave)
+        if valor is not None:
+            cache.move_to_end(llave)
+        return valor
+
+
+def lru_put(cache, lock, llave, valor, maximo):
+    """Guarda en un cache LRU y descarta los menos usados por encima de `maximo`."""
+    with lock:
+        cache[llave] = valor
+        cache.move_to_end(llave)
+        while len(cache) > maximo:
+            cache.popitem(last=False)
+
+
+def _duracion_get(llave):
+    return lru_get(_duraciones, _duraciones_lock, llave)
+
+
+def _duracion_put(llave, valor):
+    lru_put(_duraciones, _duraciones_lock, llave, valor, DURACION_CACHE_MAX)
+
+
+def duraciones_sop(sop_ids, versiones) -> dict:
+    """{sop_id: {nivel_id: minutos}}; una query GROUP BY para los que no están en cache."""
+    resultado = {}
+    faltantes = {}
+    for sop_id in sop_ids:
+        llave = ("sop", sop_id, versiones.get(clave_sop(sop_id), 0), versiones.get(CLAVE_CATALOGO, 0))
+        valor = _duracion_get(llave)
+        if valor is not None:
+            resultado[sop_id] = valor
+        else:
+            faltantes[sop_id] = llave
+
+    if faltantes:
+        rows = (
+            db.session.query(
+                SopFraccion.sop_id,
+                SopFraccionDetalle.nivel_limpieza_id,
+                func.sum(SopFraccionDetalle.tiempo_unitario_min),
             )
-            if detalle and detalle.tiempo_unitario_min:
-                tiempo_total += float(detalle.tiempo_unitario_min)
+            .join(SopFraccionDetalle, SopFraccionDetalle.sop_fraccion_id == SopFraccion.sop_fraccion_id)
+            .filter(SopFraccion.sop_id.in_(list(faltantes)))
+            .group_by(SopFraccion.sop_id, SopFraccionDetalle.nivel_limpieza_id)
+            .all()
+        )
+        por_sop = {sop_id: {} for sop_id in faltantes}
+        for sop_id, nivel_id, total in rows:
+            por_sop[sop_id][nivel_id] = float(total or 0)
+        for sop_id, llave in faltantes.items():
+            _duracion_put(llave, por_sop[sop_id])
+            resultado[sop_id] = por_sop[sop_id]
+
+    return resultado
+
+
+def duraciones_evento(sop_evento_ids, versiones) -> dict:
+    """{sop_evento_id: minutos}; una query GROUP BY para los que no están en cache."""
+    resultado = {}
+    faltantes = {}
+    for se_id in sop_evento_ids:
+        llave = ("evento", se_id, versiones.get(clave_sop_evento(se_id), 0), versiones.get(CLAVE_CATALOGO, 0))
+        valor = _duracion_get(llave)
+        if valor is not None:
+            resultado[se_id] = valor
+        else:
+            faltantes[se_id] = llave
+
+    if faltantes:
+        rows = (
+            db.session.query(SopEventoDetalle.sop_evento_id, func.sum(SopEventoDetalle.tiempo_estimado))
+            .filter(SopEventoDetalle.sop_evento_id.in_(list(faltantes)))
+            .group_by(SopEventoDetalle.sop_evento_id)
+            .all()
+        )
+        totales = {se_id: int(total or 0) for se_id, total in rows}
+        for se_id, llave in faltantes.items():
+            _duracion_put(llave, totales.get(se_id, 0))
+            resultado[se_id] = totales.get(se_id, 0)
+
+    return resultado
+
+
+def resolver_sop_ids(tareas_sop) -> dict:
+    """
+    sop_id efectivo por tarea: el de la tarea o, si falta, el SOP regular de
+    su subárea (una query solo si hay tareas sin sop_id).
+    """
+    resueltos = {t.tarea_id: t.sop_id for t in tareas_sop if t.sop_id}
+
+    subarea_ids_sin_sop = {t.subarea_id for t in tareas_sop if not t.sop_id and t.subarea_id}
+    if subarea_ids_sin_sop:
+        rows = (
+            db.session.query(SOP.subarea_id, SOP.sop_id)
+            .filter(SOP.subarea_id.in_(subarea_ids_sin_sop), SOP.tipo_sop == "regular")
+            .all()
+        )
+        por_subarea = {r.subarea_id: r.sop_id for r in rows}
+        for t in tareas_sop:
+            if not t.sop_id and t.subarea_id in por_subarea:
+                resueltos[t.tarea_id] = por_subarea[t.subarea_id]
+
+    return resueltos
+
+
+def tiempos_tareas(tareas) -> dict:
+    """
+    {tarea_id: minutos estimados} para una lista de tareas.
+    Una query de versiones + (solo si faltan en cache) una por tipo, más una
+    para el SOP regular si hay tareas 'sop' sin sop_id.
+    """
+    # Tareas sin sop_id (p. ej. las de la ruta base) usan el SOP regular de su subárea
+    sop_de = resolver_sop_ids([t for t in tareas if t.tipo_tarea == 'sop' and t.nivel_limpieza_asignado])
+    sop_ids = set(sop_de.values())
+    sop_evento_ids = {
+        t.sop_evento_id for t in tareas
+        if t.tipo_tarea in ('evento', 'limpieza_equipo') and t.sop_evento_id
+    }
+
+    por_sop, por_evento = {}, {}
+    if sop_ids or sop_evento_ids:
+        versiones = obtener_versiones(
+            [clave_sop(s) for s in sop_ids] + [clave_sop_evento(e) for e in sop_evento_ids]
+        )
+        por_sop = duraciones_sop(sop_ids, versiones)
+        por_evento = duraciones_evento(sop_evento_ids, versiones)
+
+    tiempos = {}
+    niveles = {}  # texto de nivel -> nivel_id (pocos valores distintos)
+    for t in tareas:
+        if t.tipo_tarea == 'receso':
+            tiempos[t.tarea_id] = 45
+        elif t.tipo_tarea in ('evento', 'limpieza_equipo'):
+            tiempos[t.tarea_id] = por_evento.get(t.sop_evento_id, 0)
+        elif t.tipo_tarea == 'sop' and sop_de.get(t.tarea_id) in por_sop:
+            nivel = t.nivel_limpieza_asignado
+            if nivel not in niveles:
+                niveles[nivel] = nivel_to_id(canon_nivel(nivel))
+            nivel_id = niveles[nivel]
+            tiempos[t.tarea_id] = por_sop[sop_de[t.tarea_id]].get(nivel_id, 0) if nivel_id else 0
+        else:
+            tiempos[t.tarea_id] = 0
+    return tiempos
 
-        return tiempo_total
 
-    return 0
+def calcular_tiempo_tarea(tarea):
+    """Calcula el tiempo estimado de una tarea según su tipo (para varias, usar tiempos_tareas)."""
+    return tiempos_tareas([tarea]).get(tarea.tarea_id, 0)
@@ -5,9 +5,9 @@ from flask import Blueprint, render_template, redirect, url_for
 from flask_login import login_required, current_user
 
 from .helpers import admin_required, get_monday, today_cdmx
+from .carga import conteos_por_fecha
 from ..extensions import db
 from ..models import (
-    LanzamientoDia, LanzamientoTarea,
     PlantillaSemanal, PlantillaSemanaAplicada,
 )
 
@@ -31,31 +31,22 @@ def home_admin_panel():
     hoy = today_cdmx()
     lunes = get_monday(hoy)
     _, semana_num, _ = lunes.isocalendar()
+    sabado = lunes + timedelta(days=5)
+    conteos = conteos_por_fecha(lunes, sabado)
     dias_semana = []
 
     for offset in range(6):  # Lunes..Sábado
         fecha_dia = lunes + timedelta(days=offset)
-        dia_db = LanzamientoDia.query.filter_by(fecha=fecha_dia).first()
-
-        if dia_db:
-            tareas = LanzamientoTarea.query.filter_by(dia_id=dia_db.dia_id).all()
-            total_tareas = len(tareas)
-            personas_unicas = {t.personal_id for t in tareas}
-            total_personas = len(personas_unicas)
-        else:
-            total_tareas = 0
-            total_personas = 0
+        conteo = conteos.get(fecha_dia, {"tareas": 0, "personas": 0})
 
         dias_semana.append({
             "fecha": fecha_dia,
-            "total_tareas": total_tareas,
-            "total_personas": total_personas,
+            "total_tareas": conteo["tareas"],
+            "total_personas": conteo["personas"],
             "link_ruta": url_for("rutas.ruta_dia", fecha=fecha_dia.strftime("%Y-%m-%d")),
             "link_plan": url_for("rutas.plan_dia_asignar", fecha=fecha_dia.strftime("%Y-%m-%d")),
         })
 
-    sabado = lunes + timedelta(days=5)
-
     plantillas = PlantillaSemanal.query.order_by(PlantillaSemanal.nombre.asc()).all()
     plantilla_activa = PlantillaSemanaAplicada.query.get(lunes)
 
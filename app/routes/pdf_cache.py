@@ -0,0 +1,145 @@
+# pdf_cache.py - Cache en disco de PDFs por contenido
+#
+# La llave es sha256(HTML renderizado + PDF_OPTIONS): mismo HTML, mismo PDF.
+# Si cambia una tarea, un check visible en el PDF o el SOP, el HTML cambia y
+# la llave también, así que no hace falta invalidar nada.
+#
+# Cada acceso actualiza el mtime del archivo; al pasar de PDF_CACHE_MAX_MB se
+# borran los menos usados (LRU por mtime). Compartido entre workers de gunicorn.
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+
+from .helpers import PDF_OPTIONS
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "luxsop_pdf_cache")
+PDF_CACHE_MAX_MB = int(os.getenv("PDF_CACHE_MAX_MB", "500"))
+
+_CLAVE_RE = re.compile(r"^[0-9a-f]{64}$")
+_evict_lock = threading.Lock()
+
+
+def clave_pdf(html: str) -> str:
+    """Llave de contenido: sha256 del HTML + opciones de wkhtmltopdf."""
+    h = hashlib.sha256()
+    h.update(html.encode("utf-8"))
+    h.update(b"\0")
+    h.update(json.dumps(PDF_OPTIONS, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def ruta_cache(clave: str):
+    """Ruta del PDF cacheado o None (no toca el mtime)."""
+    if not (clave and _CLAVE_RE.match(clave)):
+        return None
+    ruta = os.path.join(PDF_CACHE_DIR, f"{clave}.pdf")
+    return ruta if os.path.exists(ruta) else None
+
+
+def obtener(clave: str):
+    """
+    PDF cacheado abierto en modo binario (marcándolo como usado) o None.
+    Se entrega el archivo abierto y no la ruta: si otro worker lo desaloja
+    justo después, el descriptor sigue leyendo el contenido completo.
+    El llamador debe cerrarlo.
+    """
+    ruta = ruta_cache(clave)
+    if not ruta:
+        return None
+    try:
+        f = open(ruta, "rb")
+    except OSError:
+        return None
+    try:
+        os.utime(ruta, None)
+    except OSError:
+        pass
+    return f
+
+
+def guardar(clave: str, pdf_bytes: bytes):
+    """
+    Escribe el PDF de forma atómica, aplica el límite de tamaño y lo
+    retorna abierto (igual que obtener).
+    """
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    ruta = os.path.join(PDF_CACHE_DIR, f"{clave}.pdf")
+    fd, tmp = tempfile.mkstemp(dir=PDF_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_bytes)
+        archivo = open(tmp, "rb")
+        os.replace(tmp, ruta)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+    limpiar(conservar=clave)
+    return archivo
+
+
+def _entradas():
+    """[(mtime, tamaño, ruta)] de los PDFs del cache, más viejos primero."""
+    if not os.path.isdir(PDF_CACHE_DIR):
+        return []
+    entradas = []
+    for nombre in os.listdir(PDF_CACHE_DIR):
+        if not nombre.endswith(".pdf"):
+            continue
+        ruta = os.path.join(PDF_CACHE_DIR, nombre)
+        try:
+            st = os.stat(ruta)
+        except OSError:
+            continue
+        entradas.append((st.st_mtime, st.st_size, ruta))
+    entradas.sort()
+    return entradas
+
+
+def estadisticas() -> dict:
+    entradas = _entradas()
+    return {
+        "dir": PDF_CACHE_DIR,
+        "archivos": len(entradas),
+        "bytes": sum(e[1] for e in entradas),
+        "max_bytes": PDF_CACHE_MAX_MB * 1024 * 1024,
+    }
+
+
+def limpiar(max_bytes=None, todo: bool = False, conservar: str = None):
+    """
+    Borra los PDFs menos usados hasta quedar bajo max_bytes
+    (default PDF_CACHE_MAX_MB). Con todo=True vacía el cache.
+    Retorna (archivos_borrados, bytes_liberados).
+    """
+    if max_bytes is None:
+        max_bytes = PDF_CACHE_MAX_MB * 1024 * 1024
+    if todo:
+        max_bytes = 0
+
+    with _evict_lock:
+        entradas = _entradas()
+        total = sum(e[1] for e in entradas)
+        borrados = 0
+        liberados = 0
+
+        for _, tam, ruta in entradas:
+            if total <= max_bytes:
+                break
+            if conservar and os.path.basename(ruta) == f"{conservar}.pdf":
+                continue
+            try:
+                os.remove(ruta)
+            except OSError:
+                continue
+            total -= tam
+            borrados += 1
+            liberados += tam
+
+    return borrados, liberados
@@ -0,0 +1,257 @@
+# pdf_jobs.py - Pool acotado de wkhtmltopdf con cola de trabajos
+#
+# El request solo arma el HTML y encola; N hilos (PDF_WORKERS) toman trabajos
+# de una cola acotada (PDF_QUEUE_MAX) y lanzan wkhtmltopdf vía pdfkit. Todo
+# render del proceso (cola y paquete del día) pasa por render_pdf, que limita
+# a N los wkhtmltopdf simultáneos por worker de gunicorn.
+#
+# El estado de cada trabajo vive en disco (PDF_JOBS_DIR/<job_id>.json) para
+# que el status/descarga funcione desde cualquier worker de gunicorn. El PDF
+# en sí vive en el cache por contenido (pdf_cache): si ya existe, el trabajo
+# nace terminado y no se lanza wkhtmltopdf.
+import json
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+
+from .helpers import pdfkit, PDFKIT_CONFIG, PDF_OPTIONS, now_cdmx
+from . import pdf_cache
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_QUEUE_MAX = int(os.getenv("PDF_QUEUE_MAX", "50"))
+PDF_JOB_TTL_MIN = int(os.getenv("PDF_JOB_TTL_MIN", "60"))
+PDF_JOBS_DIR = os.getenv("PDF_JOBS_DIR") or os.path.join(tempfile.gettempdir(), "luxsop_pdf_jobs")
+
+ESTADO_EN_COLA = "en_cola"
+ESTADO_PROCESANDO = "procesando"
+ESTADO_LISTO = "listo"
+ESTADO_ERROR = "error"
+
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ColaLlena(Exception):
+    """La cola de PDFs alcanzó PDF_QUEUE_MAX."""
+
+
+# =========================
+# Almacenamiento de trabajos
+# =========================
+def job_id_valido(job_id: str) -> bool:
+    return bool(job_id and _JOB_ID_RE.match(job_id))
+
+
+def _ruta(job_id: str, ext: str) -> str:
+    return os.path.join(PDF_JOBS_DIR, f"{job_id}.{ext}")
+
+
+def _escribir_estado(job_id: str, estado: dict):
+    tmp = _ruta(job_id, "json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(estado, f)
+    os.replace(tmp, _ruta(job_id, "json"))
+
+
+def leer_estado(job_id: str):
+    """Estado del trabajo o None si no existe (o el id es inválido)."""
+    if not job_id_valido(job_id):
+        return None
+    try:
+        with open(_ruta(job_id, "json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def abrir_pdf(job_id: str):
+    """PDF terminado (del cache) abierto en modo binario, o None."""
+    estado = leer_estado(job_id)
+    if not estado:
+        return None
+    return pdf_cache.obtener(estado.get("clave"))
+
+
+def _actualizar_estado(job_id: str, **campos):
+    estado = leer_estado(job_id) or {}
+    estado.update(campos)
+    _escribir_estado(job_id, estado)
+
+
+def purgar_trabajos_viejos():
+    """Borra trabajos con más de PDF_JOB_TTL_MIN minutos."""
+    if not os.path.isdir(PDF_JOBS_DIR):
+        return 0
+    limite = time.time() - PDF_JOB_TTL_MIN * 60
+    borrados = 0
+    for nombre in os.listdir(PDF_JOBS_DIR):
+        ruta = os.path.join(PDF_JOBS_DIR, nombre)
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+                borrados += 1
+        except OSError:
+            continue
+    return borrados
+
+
+# =========================
+# Métricas (por proceso)
+# =========================
+_metricas_lock = threading.Lock()
+_metricas = {
+    "encolados": 0,
+    "completados": 0,
+    "errores": 0,
+    "rechazados": 0,
+    "en_proceso": 0,
+    "cache_hits": 0,
+    "cache_misses": 0,
+}
+_tiempos_render = deque(maxlen=200)
+
+
+def _sumar(campo: str, n: int = 1):
+    with _metricas_lock:
+        _metricas[campo] += n
+
+
+def metricas() -> dict:
+    """Profundidad de cola y tiempos de render de este worker de gunicorn."""
+    with _metricas_lock:
+        datos = dict(_metricas)
+        tiempos = sorted(_tiempos_render)
+
+    def percentil(p):
+        if not tiempos:
+            return None
+        idx = min(len(tiempos) - 1, int(round(p * (len(tiempos) - 1))))
+        return round(tiempos[idx], 3)
+
+    datos.update({
+        "pid": os.getpid(),
+        "workers": PDF_WORKERS,
+        "cola_max": PDF_QUEUE_MAX,
+        "cola_profundidad": _cola.qsize(),
+        "render_muestras": len(tiempos),
+        "render_prom_s": round(sum(tiempos) / len(tiempos), 3) if tiempos else None,
+        "render_p50_s": percentil(0.50),
+        "render_p95_s": percentil(0.95),
+        "render_max_s": round(tiempos[-1], 3) if tiempos else None,
+        "cache": pdf_cache.estadisticas(),
+    })
+    return datos
+
+
+# =========================
+# Pool
+# =========================
+_cola = queue.Queue(maxsize=PDF_QUEUE_MAX)
+_hilos = []
+_hilos_lock = threading.Lock()
+_renders = threading.BoundedSemaphore(max(1, PDF_WORKERS))
+
+
+def render_pdf(html: str) -> bytes:
+    """
+    Render síncrono de HTML a PDF con wkhtmltopdf (máximo PDF_WORKERS a la
+    vez en el proceso); registra el tiempo en las métricas.
+    """
+    with _renders:
+        inicio = time.monotonic()
+        pdf_bytes = pdfkit.from_string(html, False, configuration=PDFKIT_CONFIG, options=PDF_OPTIONS)
+    with _metricas_lock:
+        _tiempos_render.append(time.monotonic() - inicio)
+    return pdf_bytes
+
+
+def pdf_cacheado(html: str, clave: str = None):
+    """
+    PDF para este HTML, abierto en modo binario (el llamador lo cierra):
+    del cache si existe, si no lo renderiza y guarda.
+    """
+    clave = clave or pdf_cache.clave_pdf(html)
+    archivo = pdf_cache.obtener(clave)
+    if archivo:
+        _sumar("cache_hits")
+        return archivo
+
+    _sumar("cache_misses")
+    return pdf_cache.guardar(clave, render_pdf(html))
+
+
+def _worker():
+    while True:
+        job_id, html, clave = _cola.get()
+        _sumar("en_proceso")
+        try:
+            _actualizar_estado(job_id, estado=ESTADO_PROCESANDO, iniciado_en=now_cdmx().isoformat())
+            pdf_cacheado(html, clave).close()
+            _actualizar_estado(job_id, estado=ESTADO_LISTO, terminado_en=now_cdmx().isoformat())
+            _sumar("completados")
+        except Exception as e:
+            _actualizar_estado(job_id, estado=ESTADO_ERROR, error=str(e), terminado_en=now_cdmx().isoformat())
+            _sumar("errores")
+        finally:
+            _sumar("en_proceso", -1)
+            _cola.task_done()
+
+
+def _asegurar_hilos():
+    with _hilos_lock:
+        vivos = [h for h in _hilos if h.is_alive()]
+        _hilos[:] = vivos
+        for i in range(PDF_WORKERS - len(vivos)):
+            h = threading.Thread(target=_worker, name=f"pdf-worker-{len(_hilos) + 1}", daemon=True)
+            h.start()
+            _hilos.append(h)
+
+
+def encolar_pdf(html: str, nombre_archivo: str, **meta) -> str:
+    """
+    Encola el render de un HTML y retorna el job_id.
+    Si el PDF ya está en el cache el trabajo se crea terminado.
+    Lanza ColaLlena si hay PDF_QUEUE_MAX trabajos esperando.
+    """
+    os.makedirs(PDF_JOBS_DIR, exist_ok=True)
+    purgar_trabajos_viejos()
+
+    job_id = uuid.uuid4().hex
+    clave = pdf_cache.clave_pdf(html)
+    ahora = now_cdmx().isoformat()
+    estado = {
+        "job_id": job_id,
+        "estado": ESTADO_EN_COLA,
+        "nombre_archivo": nombre_archivo,
+        "clave": clave,
+        "creado_en": ahora,
+        **meta,
+    }
+
+    archivo = pdf_cache.obtener(clave)
+    if archivo:
+        archivo.close()
+        _sumar("cache_hits")
+        estado.update(estado=ESTADO_LISTO, terminado_en=ahora)
+        _escribir_estado(job_id, estado)
+        return job_id
+
+    _asegurar_hilos()
+    _escribir_estado(job_id, estado)
+
+    try:
+        _cola.put_nowait((job_id, html, clave))
+    except queue.Full:
+        try:
+            os.remove(_ruta(job_id, "json"))
+        except OSError:
+            pass
+        _sumar("rechazados")
+        raise ColaLlena()
+
+    _sumar("encolados")
+    return job_id
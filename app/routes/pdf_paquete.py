@@ -0,0 +1,154 @@
+# pdf_paquete.py - PDFs del día para todo el personal en un solo archivo
+#
+# Los datos del día se cargan una sola vez para toda la cuadrilla; el HTML de
+# cada persona se arma en el proceso web y el render se reparte en unos pocos
+# hilos (el trabajo pesado ya corre fuera de proceso, en wkhtmltopdf). Los
+# renders comparten el límite de pdf_jobs (PDF_WORKERS por worker), así que un
+# paquete no se suma a la cola sino que espera turno. Cada parte pasa por el
+# cache de PDFs (pdf_cache): reimprimir el mismo día casi no cuesta.
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from flask import render_template
+
+from .pdf_jobs import pdf_cacheado
+from .reportes_data import cargar_tareas_reporte, construir_detalles, agrupar_por_persona
+from . import pdf_cache
+from ..models import LanzamientoDia
+
+try:
+    from pypdf import PdfWriter
+except Exception:
+    PdfWriter = None
+
+PDF_PAQUETE_HILOS = int(os.getenv("PDF_PAQUETE_HILOS", "4"))
+
+
+# =========================
+# HTML
+# =========================
+def html_reporte_pdf(persona, fecha_obj, detalles) -> str:
+    return render_template("reportes/sop_macro_pdf.html", persona=persona, fecha=fecha_obj, detalles=detalles)
+
+
+def preparar_partes(fecha_obj):
+    """
+    Arma el HTML de cada persona con tareas en el día (una carga para todos).
+    Retorna lista de {personal_id, nombre, nombre_archivo, html, clave}
+    ordenada por nombre, o None si no existe el día.
+    """
+    dia = LanzamientoDia.query.filter_by(fecha=fecha_obj).first()
+    if not dia:
+        return None
+
+    tareas = cargar_tareas_reporte(dia.dia_id)
+    personas = {t.personal_id: t.personal for t in tareas}
+    por_persona = agrupar_por_persona(construir_detalles(tareas))
+
+    fecha_str = fecha_obj.strftime("%Y-%m-%d")
+    partes = []
+    for pid in sorted(por_persona, key=lambda p: ((personas[p].nombre or "").lower(), p)):
+        html = html_reporte_pdf(personas[pid], fecha_obj, por_persona[pid])
+        partes.append({
+            "personal_id": pid,
+            "nombre": personas[pid].nombre,
+            "nombre_archivo": f"SOP_{pid}_{fecha_str}.pdf",
+            "html": html,
+            "clave": pdf_cache.clave_pdf(html),
+        })
+    return partes
+
+
+# =========================
+# Render
+# =========================
+def renderizar_partes(partes):
+    """
+    Genera (parte, archivo, error) conforme termina cada PDF; `archivo` es
+    el PDF abierto y lo cierra quien lo consume. Las partes ya cacheadas
+    salen primero sin lanzar renders.
+    """
+    pendientes = []
+    for parte in partes:
+        archivo = pdf_cache.obtener(parte["clave"])
+        if archivo:
+            yield parte, archivo, None
+        else:
+            pendientes.append(parte)
+
+    if not pendientes:
+        return
+
+    with ThreadPoolExecutor(max_workers=max(1, min(PDF_PAQUETE_HILOS, len(pendientes)))) as pool:
+        futuros = {pool.submit(pdf_cacheado, p["html"], p["clave"]): p for p in pendientes}
+        for futuro in as_completed(futuros):
+            parte = futuros[futuro]
+            try:
+                yield parte, futuro.result(), None
+            except Exception as e:
+                yield parte, None, str(e)
+
+
+# =========================
+# Salidas
+# =========================
+class _Buffer:
+    """Stream sin seek para ZipFile: acumula bytes hasta que se vacían."""
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, data):
+        self._partes.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def vaciar(self) -> bytes:
+        data = b"".join(self._partes)
+        self._partes = []
+        return data
+
+
+def stream_zip(partes):
+    """Genera el zip por trozos, agregando cada PDF en cuanto termina."""
+    buf = _Buffer()
+    errores = []
+
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as zf:
+        for parte, archivo, error in renderizar_partes(partes):
+            if error:
+                errores.append(f"{parte['personal_id']} ({parte['nombre']}): {error}")
+                continue
+            with archivo:
+                zf.writestr(parte["nombre_archivo"], archivo.read())
+            yield buf.vaciar()
+
+        if errores:
+            zf.writestr("ERRORES.txt", "\n".join(errores) + "\n")
+
+    yield buf.vaciar()
+
+
+def pdf_unido(partes) -> bytes:
+    """Un solo PDF con todas las personas en orden (requiere pypdf)."""
+    if PdfWriter is None:
+        raise RuntimeError("pypdf no está instalado")
+
+    pdfs = {}
+    for parte, archivo, error in renderizar_partes(partes):
+        if error:
+            raise RuntimeError(f"{parte['personal_id']}: {error}")
+        with archivo:
+            pdfs[parte["personal_id"]] = archivo.read()
+
+    writer = PdfWriter()
+    for parte in partes:
+        writer.append(io.BytesIO(pdfs[parte["personal_id"]]))
+
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
@@ -1,5 +1,5 @@
 # plantillas_bp.py - Blueprint para gestión de plantillas
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
 from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
 from flask_login import login_required, current_user
 from sqlalchemy.orm import joinedload
@@ -7,12 +7,12 @@ from sqlalchemy.orm import joinedload
 from .helpers import (
     admin_required, canon_nivel, get_monday,
     borrar_asignaciones_semana, aplicar_plantilla_guardada, set_plantilla_activa,
+    guardar_semana_en_plantilla,
     today_cdmx
 )
 from ..extensions import db
 from ..models import (
     Personal, Area, SubArea, SOP,
-    LanzamientoDia, LanzamientoTarea,
     PlantillaSemanal, PlantillaItem, PlantillaSemanaAplicada,
 )
 
@@ -90,23 +90,7 @@ def guardar_semana_como_plantilla_simple():
         plantilla = PlantillaSemanal.query.get_or_404(plantilla_id)
 
         PlantillaItem.query.filter_by(plantilla_id=plantilla.plantilla_id).delete()
-
-        for i in range(6):
-            fecha_d = lunes_ref + timedelta(days=i)
-            dia = LanzamientoDia.query.filter_by(fecha=fecha_d).first()
-            if not dia:
-                continue
-            tareas = LanzamientoTarea.query.filter_by(dia_id=dia.dia_id).all()
-            for t in tareas:
-                db.session.add(PlantillaItem(
-                    plantilla_id=plantilla.plantilla_id,
-                    dia_index=i,
-                    personal_id=t.personal_id,
-                    area_id=t.area_id,
-                    subarea_id=t.subarea_id,
-                    nivel_limpieza_asignado=canon_nivel(t.nivel_limpieza_asignado) or "basica"
-                ))
-
+        guardar_semana_en_plantilla(plantilla.plantilla_id, lunes_ref)
         db.session.commit()
         flash(f'Plantilla "{plantilla.nombre}" sobrescrita con la semana actual.', "success")
         return redirect(url_for("home.home"))
@@ -122,24 +106,9 @@ def guardar_semana_como_plantilla_simple():
 
     plantilla = PlantillaSemanal(nombre=nombre)
     db.session.add(plantilla)
-    db.session.commit()
-
-    for i in range(6):
-        fecha_d = lunes_ref + timedelta(days=i)
-        dia = LanzamientoDia.query.filter_by(fecha=fecha_d).first()
-        if not dia:
-            continue
-        tareas = LanzamientoTarea.query.filter_by(dia_id=dia.dia_id).all()
-        for t in tareas:
-            db.session.add(PlantillaItem(
-                plantilla_id=plantilla.plantilla_id,
-                dia_index=i,
-                personal_id=t.personal_id,
-                area_id=t.area_id,
-                subarea_id=t.subarea_id,
-                nivel_limpieza_asignado=canon_nivel(t.nivel_limpieza_asignado) or "basica"
-            ))
+    db.session.flush()
 
+    guardar_semana_en_plantilla(plantilla.plantilla_id, lunes_ref)
     db.session.commit()
     flash(f'Plantilla "{plantilla.nombre}" creada correctamente.', "success")
     return redirect(url_for("home.home"))
@@ -0,0 +1,85 @@
+# precalentar.py - Precalentar los PDFs del día siguiente
+#
+# Arma el HTML de cada operario y renderiza los PDFs que falten al cache en
+# disco (pdf_cache), que es lo único compartido con los workers de gunicorn.
+# Los caches en memoria de reportes (planes compilados, fragmentos HTML) son
+# por proceso: este comando no los calienta y los workers arrancan en frío.
+#
+# Uso (una sola vez por noche, desde cron; no corre dentro de los workers):
+#   flask reportes precalentar [--fecha YYYY-MM-DD]   (default: mañana)
+#
+# Un lock de archivo en PDF_CACHE_DIR evita que dos corridas se encimen.
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows (desarrollo): sin lock entre procesos
+    fcntl = None
+
+from .pdf_paquete import preparar_partes, renderizar_partes
+from . import pdf_cache
+
+
+class EnCurso(Exception):
+    """Otro proceso ya está precalentando."""
+
+
+@contextmanager
+def _lock_precalentar():
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(pdf_cache.PDF_CACHE_DIR, exist_ok=True)
+    with open(os.path.join(pdf_cache.PDF_CACHE_DIR, ".precalentar.lock"), "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            raise EnCurso()
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def precalentar_dia(fecha_obj) -> dict:
+    """
+    Deja en el cache de PDFs el reporte de cada operario con tareas en fecha_obj.
+    Lanza EnCurso si otro proceso ya lo está haciendo.
+    """
+    with _lock_precalentar():
+        return _precalentar(fecha_obj)
+
+
+def _precalentar(fecha_obj) -> dict:
+    inicio = time.monotonic()
+    resultado = {
+        "fecha": fecha_obj.strftime("%Y-%m-%d"),
+        "existe": False,
+        "personas": 0,
+        "pdf_en_cache": 0,
+        "pdf_generados": 0,
+        "pdf_errores": [],
+    }
+
+    partes = preparar_partes(fecha_obj)
+    if partes is None:
+        return resultado
+
+    resultado["existe"] = True
+    resultado["personas"] = len(partes)
+
+    en_cache = {p["clave"] for p in partes if pdf_cache.ruta_cache(p["clave"])}
+    for parte, archivo, error in renderizar_partes(partes):
+        if archivo:
+            archivo.close()
+        if error:
+            resultado["pdf_errores"].append(f"{parte['personal_id']}: {error}")
+        elif parte["clave"] in en_cache:
+            resultado["pdf_en_cache"] += 1
+        else:
+            resultado["pdf_generados"] += 1
+
+    resultado["segundos"] = round(time.monotonic() - inicio, 2)
+    return resultado
@@ -0,0 +1,87 @@
+# progreso.py - Progreso del día para supervisores (tablero con polling)
+#
+# El tablero pide /admin/progreso/estado cada PROGRESO_POLL_S segundos. Cada
+# respuesta es corta (no retiene hilos de gunicorn como un stream abierto) y
+# el snapshot se guarda PROGRESO_TTL_S segundos por worker, así que muchos
+# tableros abiertos cuestan como mucho dos queries por worker cada TTL.
+import os
+import threading
+import time
+
+from .helpers import today_cdmx
+from ..extensions import db
+from ..models import Personal, LanzamientoDia, LanzamientoTarea, TareaCheck
+
+PROGRESO_TTL_S = int(os.getenv("PROGRESO_TTL_S", "5"))
+PROGRESO_POLL_S = int(os.getenv("PROGRESO_POLL_S", "10"))
+
+_ULTIMOS_CHECKS = 20
+
+_lock = threading.Lock()
+_cache = {"fecha": None, "hasta": 0.0, "datos": None}
+
+
+# =========================
+# Estado del día
+# =========================
+def _cargar(fecha) -> dict:
+    """Progreso por operario y últimos checks del día; dos queries."""
+    filas = (
+        db.session.query(
+            LanzamientoTarea.personal_id,
+            Personal.nombre,
+            TareaCheck.check_id,
+        )
+        .join(LanzamientoDia, LanzamientoDia.dia_id == LanzamientoTarea.dia_id)
+        .join(Personal, Personal.personal_id == LanzamientoTarea.personal_id)
+        .outerjoin(TareaCheck, TareaCheck.tarea_id == LanzamientoTarea.tarea_id)
+        .filter(LanzamientoDia.fecha == fecha)
+        .all()
+    )
+    ops = {}
+    for f in filas:
+        op = ops.setdefault(f.personal_id, {"personal_id": f.personal_id, "nombre": f.nombre, "hechas": 0, "total": 0})
+        op["total"] += 1
+        if f.check_id is not None:
+            op["hechas"] += 1
+
+    operarios = sorted(ops.values(), key=lambda o: ((o["nombre"] or "").lower(), o["personal_id"]))
+    for o in operarios:
+        o["pct"] = round(o["hechas"] / o["total"] * 100) if o["total"] else 0
+
+    recientes = (
+        db.session.query(TareaCheck.checked_at, Personal.nombre)
+        .join(LanzamientoTarea, LanzamientoTarea.tarea_id == TareaCheck.tarea_id)
+        .join(LanzamientoDia, LanzamientoDia.dia_id == LanzamientoTarea.dia_id)
+        .join(Personal, Personal.personal_id == LanzamientoTarea.personal_id)
+        .filter(LanzamientoDia.fecha == fecha)
+        .order_by(TareaCheck.checked_at.desc())
+        .limit(_ULTIMOS_CHECKS)
+        .all()
+    )
+
+    hechas = sum(o["hechas"] for o in operarios)
+    total = sum(o["total"] for o in operarios)
+    return {
+        "fecha": fecha.strftime("%Y-%m-%d"),
+        "operarios": operarios,
+        "hechas": hechas,
+        "total": total,
+        "pct": round(hechas / total * 100) if total else 0,
+        "ultimos": [{"hora": r.checked_at.strftime("%H:%M"), "nombre": r.nombre} for r in recientes],
+        "poll_s": PROGRESO_POLL_S,
+    }
+
+
+def snapshot() -> dict:
+    """Progreso de hoy; se reutiliza PROGRESO_TTL_S segundos dentro del worker."""
+    hoy = today_cdmx()
+    ahora = time.monotonic()
+    with _lock:
+        if _cache["fecha"] == hoy and _cache["hasta"] > ahora:
+            return _cache["datos"]
+
+    datos = _cargar(hoy)
+    with _lock:
+        _cache.update({"fecha": hoy, "hasta": ahora + PROGRESO_TTL_S, "datos": datos})
+    return datos
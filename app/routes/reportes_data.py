@@ -0,0 +1,870 @@
+# reportes_data.py - Carga por lotes de las tareas del día para reportes
+#
+# Un solo cargador alimenta el reporte HTML y el PDF:
+# - cargar_tareas_reporte: tareas del día (SOPs + fijas + eventos), sin el grafo SOP
+# - obtener_planes: "planes" compilados por (sop_id, nivel) y por sop_evento_id,
+#   con filas listas para renderizar; cache LRU en memoria cuya llave incluye
+#   la versión de contenido (ver app/versiones.py)
+# - construir_detalles: arma los bloques por tarea a partir de los planes
+# - fragmentos_detalles: HTML de fracciones por tarea, cacheado por plan
+# - huella_dia_persona: huella barata (ETag) del reporte/mi_ruta sin el grafo SOP
+# - reporte_compacto: JSON compacto del día con delta por token `since`
+# - paquete_offline: reporte compacto completo + instructivos (modo sin conexión)
+import base64
+import binascii
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+from flask import render_template
+from markupsafe import Markup, escape
+from sqlalchemy import and_
+from sqlalchemy.orm import joinedload, selectinload, aliased
+
+from .helpers import (
+    canon_nivel, nivel_to_id, lru_get, lru_put, resolver_sop_ids,
+    na, fmt_consumo, fmt_herramientas_list, fmt_quimico_y_receta,
+)
+from ..extensions import db
+from ..models import (
+    LanzamientoTarea, TareaCheck, Personal, Area, SubArea,
+    SOP, SopFraccion, SopFraccionDetalle,
+    SopEvento, SopEventoDetalle, SopEventoFraccion,
+    MetodologiaEventoFraccion,
+    Metodologia, MetodologiaBase,
+    Kit, KitDetalle, Receta, RecetaDetalle,
+    ElementoSet, ElementoDetalle,
+    Fraccion, InstructivoTrabajo,
+)
+from ..versiones import obtener_versiones, clave_sop, clave_sop_evento, CLAVE_CATALOGO
+
+
+TIPO_NOMBRE_FIJA = {
+    'inicio': 'INICIO',
+    'receso': 'RECESO',
+}
+
+TIEMPO_FIJO = {'receso': 45}
+
+NIVEL_POR_ID = {1: "basica", 2: "media", 3: "profundo", 4: "extraordinario"}
+
+
+def build_met_map(fraccion_ids, nivel_ids):
+    """Construye mapa de metodologías para fracciones y niveles."""
+    if not fraccion_ids or not nivel_ids:
+        return {}
+
+    metodologias = (
+        Metodologia.query
+        .filter(
+            Metodologia.fraccion_id.in_(fraccion_ids),
+            Metodologia.nivel_limpieza_id.in_(nivel_ids)
+        )
+        .options(
+            joinedload(Metodologia.metodologia_base)
+            .selectinload(MetodologiaBase.pasos)
+        )
+        .all()
+    )
+
+    return {(m.fraccion_id, m.nivel_limpieza_id): m.metodologia_base for m in metodologias}
+
+
+# =========================
+# Carga
+# =========================
+def cargar_tareas_reporte(dia_id: int, personal_id: str = None, tarea_ids=None):
+    """Tareas del día (de una persona o de todas). El contenido SOP viene de los planes."""
+    query = LanzamientoTarea.query.filter_by(dia_id=dia_id)
+    if personal_id is not None:
+        query = query.filter_by(personal_id=personal_id)
+    if tarea_ids is not None:
+        query = query.filter(LanzamientoTarea.tarea_id.in_(list(tarea_ids)))
+
+    return (
+        query
+        .options(
+            joinedload(LanzamientoTarea.personal),
+            joinedload(LanzamientoTarea.area),
+            joinedload(LanzamientoTarea.subarea),
+        )
+        .order_by(LanzamientoTarea.orden, LanzamientoTarea.tarea_id)
+        .all()
+    )
+
+
+def cargar_sops_completos(sop_ids):
+    """SOPs con todo su grafo (fracciones, detalles, kits, recetas, elementos) vía selectinload."""
+    if not sop_ids:
+        return []
+
+    return (
+        SOP.query
+        .filter(SOP.sop_id.in_(list(sop_ids)))
+        .options(
+            selectinload(SOP.sop_fracciones).selectinload(SopFraccion.fraccion).selectinload(Fraccion.instructivo),
+            selectinload(SOP.sop_fracciones).selectinload(SopFraccion.detalles).selectinload(SopFraccionDetalle.kit).selectinload(Kit.detalles).selectinload(KitDetalle.herramienta),
+            selectinload(SOP.sop_fracciones).selectinload(SopFraccion.detalles).selectinload(SopFraccionDetalle.receta).selectinload(Receta.detalles).selectinload(RecetaDetalle.quimico),
+            selectinload(SOP.sop_fracciones).selectinload(SopFraccion.detalles).selectinload(SopFraccionDetalle.consumo),
+            selectinload(SOP.sop_fracciones).selectinload(SopFraccion.detalles).selectinload(SopFraccionDetalle.elemento_set).selectinload(ElementoSet.detalles).selectinload(ElementoDetalle.elemento),
+            selectinload(SOP.sop_fracciones).selectinload(SopFraccion.detalles).selectinload(SopFraccionDetalle.elemento_set).selectinload(ElementoSet.detalles).selectinload(ElementoDetalle.receta).selectinload(Receta.detalles).selectinload(RecetaDetalle.quimico),
+            selectinload(SOP.sop_fracciones).selectinload(SopFraccion.detalles).selectinload(SopFraccionDetalle.elemento_set).selectinload(ElementoSet.detalles).selectinload(ElementoDetalle.kit).selectinload(Kit.detalles).selectinload(KitDetalle.herramienta),
+            selectinload(SOP.sop_fracciones).selectinload(SopFraccion.detalles).selectinload(SopFraccionDetalle.elemento_set).selectinload(ElementoSet.detalles).selectinload(ElementoDetalle.consumo),
+        )
+        .all()
+    )
+
+
+def cargar_eventos_completos(sop_evento_ids):
+    """SOPs de evento con detalles, metodologías, kits y recetas vía selectinload."""
+    if not sop_evento_ids:
+        return []
+
+    return (
+        SopEvento.query
+        .filter(SopEvento.sop_evento_id.in_(list(sop_evento_ids)))
+        .options(
+            selectinload(SopEvento.evento_catalogo),
+            selectinload(SopEvento.caso_catalogo),
+            selectinload(SopEvento.detalles).selectinload(SopEventoDetalle.fraccion).selectinload(SopEventoFraccion.metodologia).selectinload(MetodologiaEventoFraccion.pasos),
+            selectinload(SopEvento.detalles).selectinload(SopEventoDetalle.kit).selectinload(Kit.detalles).selectinload(KitDetalle.herramienta),
+            selectinload(SopEvento.detalles).selectinload(SopEventoDetalle.receta).selectinload(Receta.detalles).selectinload(RecetaDetalle.quimico),
+            selectinload(SopEvento.detalles).selectinload(SopEventoDetalle.consumo),
+        )
+        .all()
+    )
+
+
+def _metodologia_dict(metodologia):
+    pasos = sorted(list(metodologia.pasos or []), key=lambda p: (p.orden or 0))
+    return {
+        "descripcion": metodologia.descripcion or "",
+        "pasos": [{"instruccion": p.instruccion} for p in pasos],
+    }
+
+
+def _metodologia_evento_dict(metodologia):
+    if not metodologia:
+        return None
+    return {
+        "descripcion": metodologia.descripcion or "",
+        "pasos": [{"instruccion": p.descripcion} for p in (metodologia.pasos or [])],
+    }
+
+
+def _tabla_sop(sd):
+    elemento_set = sd.elemento_set
+
+    if elemento_set:
+        headers = ["Elemento", "Cantidad", "Químico", "Receta", "Consumo", "Herramienta"]
+        rows = []
+
+        for ed in sorted((elemento_set.detalles or []), key=lambda x: (x.orden or 9999, x.elemento_id)):
+            elemento = ed.elemento
+            q_str, r_str = fmt_quimico_y_receta(ed.receta)
+            c_str = fmt_consumo(ed.consumo)
+            h_str = fmt_herramientas_list(ed.kit)
+
+            rows.append([
+                na(elemento.descripcion if elemento else None),
+                na(str(elemento.cantidad if elemento else "")),
+                q_str,
+                r_str,
+                c_str,
+                h_str,
+            ])
+
+        return {"headers": headers, "rows": rows}
+
+    headers = ["Químico", "Receta", "Consumo", "Herramienta"]
+    q_str, r_str = fmt_quimico_y_receta(sd.receta)
+    c_str = fmt_consumo(sd.consumo)
+    h_str = fmt_herramientas_list(sd.kit)
+    return {"headers": headers, "rows": [[q_str, r_str, c_str, h_str]]}
+
+
+def fracciones_sop(sop_full, nivel_id: int, nivel_asignado: str, met_map):
+    """Filas de fracciones de un SOP para un nivel. Retorna (fracciones, tiempo_total_min)."""
+    fracciones = []
+    tiempo_total_min = 0.0
+
+    for sf in sop_full.sop_fracciones or []:
+        sd = next((d for d in (sf.detalles or []) if d.nivel_limpieza_id == nivel_id), None)
+        if not sd:
+            continue
+
+        fr = sf.fraccion
+        metodologia = met_map.get((sf.fraccion_id, sd.nivel_limpieza_id))
+        if not metodologia:
+            continue
+
+        tiempo_min = float(sd.tiempo_unitario_min) if sd.tiempo_unitario_min is not None else None
+        if tiempo_min is not None:
+            tiempo_total_min += tiempo_min
+
+        instructivo = fr.instructivo if fr else None
+
+        fracciones.append({
+            "orden": sf.orden,
+            "fraccion_nombre": fr.fraccion_nombre if fr else "",
+            "fraccion_id": fr.fraccion_id if fr else None,
+            "nombre_full": fr.nombre_full if fr else "",
+            "descripcion": metodologia.descripcion or "",
+            "nivel_limpieza": nivel_asignado,
+            "tiempo_min": round(tiempo_min, 2) if tiempo_min is not None else None,
+            "metodologia": _metodologia_dict(metodologia),
+            "tabla": _tabla_sop(sd),
+            "observacion_critica": (fr.nota_tecnica if fr else None),
+            "instructivo": {
+                "instructivo_id": instructivo.instructivo_id,
+                "codigo": instructivo.codigo,
+                "instructivo_nombre": instructivo.instructivo_nombre,
+            } if instructivo else None,
+        })
+
+    return fracciones, round(tiempo_total_min, 2)
+
+
+def fracciones_evento(sop_evento):
+    """Filas de fracciones de un SOP de evento. Retorna (fracciones, tiempo_total_min)."""
+    fracciones = []
+    tiempo_total = 0
+
+    for detalle in sop_evento.detalles or []:
+        fraccion = detalle.fraccion
+        metodologia = fraccion.metodologia if fraccion else None
+        tiempo_total += detalle.tiempo_estimado or 0
+
+        tabla = None
+        if detalle.kit or detalle.receta or detalle.consumo:
+            headers = ["Químico", "Receta", "Consumo", "Herramienta"]
+            q_str, r_str = fmt_quimico_y_receta(detalle.receta)
+            c_str = fmt_consumo(detalle.consumo)
+            h_str = fmt_herramientas_list(detalle.kit)
+            tabla = {"headers": headers, "rows": [[q_str, r_str, c_str, h_str]]}
+
+        fracciones.append({
+            "orden": detalle.orden,
+            "fraccion_nombre": fraccion.nombre if fraccion else "",
+            "nombre_full": fraccion.nombre if fraccion else "",
+            "descripcion": metodologia.descripcion if metodologia else "",
+            "nivel_limpieza": "—",
+            "tiempo_min": detalle.tiempo_estimado,
+            "metodologia": _metodologia_evento_dict(metodologia),
+            "tabla": tabla,
+            "observacion_critica": detalle.observaciones,
+        })
+
+    return fracciones, tiempo_total
+
+
+# =========================
+# Caches LRU en memoria
+# =========================
+PLAN_CACHE_MAX = int(os.getenv("REPORTE_PLAN_CACHE_MAX", "512"))
+FRAGMENTO_CACHE_MAX = int(os.getenv("REPORTE_FRAGMENTO_CACHE_MAX", "512"))
+
+_planes = OrderedDict()
+_planes_lock = threading.Lock()
+_fragmentos = OrderedDict()
+_fragmentos_lock = threading.Lock()
+
+
+def _plan_get(llave):
+    return lru_get(_planes, _planes_lock, llave)
+
+
+def _plan_put(llave, plan):
+    lru_put(_planes, _planes_lock, llave, plan, PLAN_CACHE_MAX)
+
+
+def limpiar_planes():
+    """Vacía los caches de planes y fragmentos de este proceso."""
+    with _planes_lock:
+        _planes.clear()
+    with _fragmentos_lock:
+        _fragmentos.clear()
+
+
+def compilar_plan_sop(sop_full, nivel_id: int, met_map, version) -> dict:
+    """Plan listo para renderizar de un SOP en un nivel (solo datos planos, sin ORM)."""
+    nivel = NIVEL_POR_ID.get(nivel_id)
+    fracciones, tiempo_total_min = fracciones_sop(sop_full, nivel_id, nivel, met_map)
+    return {
+        "sop_id": sop_full.sop_id,
+        "nivel_id": nivel_id,
+        "nivel": nivel,
+        "observacion_critica": sop_full.observacion_critica_sop,
+        "fracciones": fracciones,
+        "tiempo_total_min": tiempo_total_min,
+        "version": version,
+    }
+
+
+def compilar_plan_evento(sop_evento, version) -> dict:
+    """Plan listo para renderizar de un SOP de evento."""
+    fracciones, tiempo_total = fracciones_evento(sop_evento)
+    return {
+        "sop_evento_id": sop_evento.sop_evento_id,
+        "descripcion": sop_evento.descripcion,
+        "evento_nombre": sop_evento.evento_catalogo.nombre if sop_evento.evento_catalogo else "",
+        "caso_nombre": sop_evento.caso_catalogo.nombre if sop_evento.caso_catalogo else "",
+        "fracciones": fracciones,
+        "tiempo_total_min": tiempo_total,
+        "version": version,
+    }
+
+
+def obtener_planes(claves_sop=(), sop_evento_ids=()):
+    """
+    Planes para cada (sop_id, nivel_id) y cada sop_evento_id pedidos.
+    Lee las versiones de contenido en una query; solo carga el grafo SOP de
+    los planes que no están en cache (o cuya versión cambió).
+    Retorna (planes_sop, planes_evento). Las claves sin SOP no aparecen.
+    """
+    claves_sop = set(claves_sop)
+    sop_evento_ids = set(sop_evento_ids)
+    if not claves_sop and not sop_evento_ids:
+        return {}, {}
+
+    versiones = obtener_versiones(
+        [clave_sop(sop_id) for sop_id, _ in claves_sop]
+        + [clave_sop_evento(se_id) for se_id in sop_evento_ids]
+    )
+    v_catalogo = versiones[CLAVE_CATALOGO]
+
+    planes_sop = {}
+    faltantes_sop = {}
+    for sop_id, nivel_id in claves_sop:
+        version = (versiones[clave_sop(sop_id)], v_catalogo)
+        llave = ("sop", sop_id, nivel_id, version)
+        plan = _plan_get(llave)
+        if plan is not None:
+            planes_sop[(sop_id, nivel_id)] = plan
+        else:
+            faltantes_sop[(sop_id, nivel_id)] = (llave, version)
+
+    planes_evento = {}
+    faltantes_evento = {}
+    for se_id in sop_evento_ids:
+        version = (versiones[clave_sop_evento(se_id)], v_catalogo)
+        llave = ("evento", se_id, version)
+        plan = _plan_get(llave)
+        if plan is not None:
+            planes_evento[se_id] = plan
+        else:
+            faltantes_evento[se_id] = (llave, version)
+
+    if faltantes_sop:
+        sops_full = {sop.sop_id: sop for sop in cargar_sops_completos({k[0] for k in faltantes_sop})}
+
+        fraccion_ids = {
+            sf.fraccion_id
+            for sop in sops_full.values()
+            for sf in (sop.sop_fracciones or [])
+        }
+        met_map = build_met_map(fraccion_ids, {k[1] for k in faltantes_sop})
+
+        for (sop_id, nivel_id), (llave, version) in faltantes_sop.items():
+            sop_full = sops_full.get(sop_id)
+            if not sop_full:
+                continue
+            plan = compilar_plan_sop(sop_full, nivel_id, met_map, version)
+            _plan_put(llave, plan)
+            planes_sop[(sop_id, nivel_id)] = plan
+
+    if faltantes_evento:
+        eventos = {se.sop_evento_id: se for se in cargar_eventos_completos(faltantes_evento.keys())}
+        for se_id, (llave, version) in faltantes_evento.items():
+            sop_evento = eventos.get(se_id)
+            if not sop_evento:
+                continue
+            plan = compilar_plan_evento(sop_evento, version)
+            _plan_put(llave, plan)
+            planes_evento[se_id] = plan
+
+    return planes_sop, planes_evento
+
+
+# =========================
+# Detalles por tarea
+# =========================
+def _detalle_base(t, **campos):
+    base = {
+        "tarea_id": t.tarea_id,
+        "personal_id": t.personal_id,
+        "orden": t.orden if t.orden is not None else 0,
+        "orden_area": 0,
+        "orden_subarea": 0,
+        "es_adicional": False,
+        "sop_id": None,
+        "sop_evento_id": None,
+        "plan_version": None,
+    }
+    base.update(campos)
+    return base
+
+
+def construir_detalles(tareas):
+    """
+    Arma los detalles (bloques por tarea) de una lista de tareas ya cargadas
+    con cargar_tareas_reporte. Puede contener tareas de varias personas: cada
+    detalle lleva su personal_id. El contenido viene de los planes compilados,
+    que se comparten entre tareas (y requests) con el mismo SOP y nivel.
+    """
+    tareas_sop = [t for t in tareas if t.tipo_tarea == 'sop' and t.area and t.subarea]
+    sop_por_tarea = resolver_sop_ids(tareas_sop)
+
+    nivel_por_tarea = {}
+    for t in tareas_sop:
+        nivel_id = nivel_to_id(canon_nivel(t.nivel_limpieza_asignado))
+        if nivel_id and t.tarea_id in sop_por_tarea:
+            nivel_por_tarea[t.tarea_id] = nivel_id
+
+    claves_sop = {(sop_por_tarea[tid], nivel_id) for tid, nivel_id in nivel_por_tarea.items()}
+    sop_evento_ids = {
+        t.sop_evento_id for t in tareas
+        if t.sop_evento_id and t.tipo_tarea in ('evento', 'inicio', 'receso')
+    }
+
+    planes_sop, planes_evento = obtener_planes(claves_sop, sop_evento_ids)
+
+    detalles = []
+
+    for t in tareas:
+        if t.tipo_tarea == 'sop':
+            nivel_id = nivel_por_tarea.get(t.tarea_id)
+            if not nivel_id:
+                continue
+
+            sop_id = sop_por_tarea[t.tarea_id]
+            plan = planes_sop.get((sop_id, nivel_id))
+            if not plan:
+                continue
+
+            area = t.area
+            subarea = t.subarea
+            detalles.append(_detalle_base(
+                t,
+                tipo_tarea="sop",
+                area=area.area_nombre,
+                subarea=subarea.subarea_nombre,
+                nivel=plan["nivel"],
+                tiempo_total_min=plan["tiempo_total_min"],
+                observacion_critica=plan["observacion_critica"],
+                fracciones=plan["fracciones"],
+                orden_area=area.orden_area if area.orden_area is not None else 9999,
+                orden_subarea=subarea.orden_subarea if subarea.orden_subarea is not None else 9999,
+                es_adicional=bool(t.es_adicional),
+                sop_id=sop_id,
+                nivel_id=nivel_id,
+                plan_version=plan["version"],
+            ))
+
+        elif t.tipo_tarea in ('inicio', 'receso'):
+            tipo_nombre = TIPO_NOMBRE_FIJA.get(t.tipo_tarea, t.tipo_tarea.upper())
+            plan = planes_evento.get(t.sop_evento_id) if t.sop_evento_id else None
+
+            if plan:
+                detalles.append(_detalle_base(
+                    t,
+                    tipo_tarea=t.tipo_tarea,
+                    area="—",
+                    subarea=tipo_nombre,
+                    nivel="—",
+                    tiempo_total_min=plan["tiempo_total_min"],
+                    observacion_critica=plan["descripcion"],
+                    fracciones=plan["fracciones"],
+                    sop_evento_id=t.sop_evento_id,
+                    plan_version=plan["version"],
+                ))
+            else:
+                detalles.append(_detalle_base(
+                    t,
+                    tipo_tarea=t.tipo_tarea,
+                    area="—",
+                    subarea=tipo_nombre,
+                    nivel="—",
+                    tiempo_total_min=TIEMPO_FIJO.get(t.tipo_tarea, 0),
+                    observacion_critica=None,
+                    fracciones=[],
+                ))
+
+        elif t.tipo_tarea == 'evento':
+            plan = planes_evento.get(t.sop_evento_id) if t.sop_evento_id else None
+            if not plan:
+                continue
+
+            detalles.append(_detalle_base(
+                t,
+                tipo_tarea="evento",
+                area=t.area.area_nombre if t.area else "Sin área",
+                subarea=f"EVENTO: {plan['evento_nombre']} - {plan['caso_nombre']}",
+                nivel="—",
+                tiempo_total_min=plan["tiempo_total_min"],
+                observacion_critica=plan["descripcion"],
+                fracciones=plan["fracciones"],
+                orden_area=t.area.orden_area if t.area and t.area.orden_area is not None else 9999,
+                orden_subarea=t.subarea.orden_subarea if t.subarea and t.subarea.orden_subarea is not None else 9999,
+                sop_evento_id=t.sop_evento_id,
+                plan_version=plan["version"],
+            ))
+
+    detalles.sort(key=lambda d: (d.get("orden", 0), d.get("orden_area", 9999), d.get("orden_subarea", 9999)))
+    return detalles
+
+
+def agrupar_por_persona(detalles):
+    """Agrupa detalles (ya ordenados) por personal_id conservando el orden."""
+    por_persona = {}
+    for d in detalles:
+        por_persona.setdefault(d["personal_id"], []).append(d)
+    return por_persona
+
+
+# =========================
+# Fragmentos HTML por tarea
+# =========================
+# Lo que cambia por tarea dentro del bloque (link al instructivo) se renderiza
+# con estas marcas y se sustituye al armar la página.
+_MARCAS = {"fecha": "__LUX_FECHA__", "personal_id": "__LUX_PERSONAL__", "tarea_id": "__LUX_TAREA__"}
+
+
+def _llave_fragmento(d):
+    if d.get("plan_version") is None:
+        return None
+    if d.get("sop_id") and d.get("nivel_id"):
+        return (d["tipo_tarea"], d["sop_id"], d["nivel_id"], d["plan_version"])
+    if d.get("sop_evento_id"):
+        return (d["tipo_tarea"], d["sop_evento_id"], d["plan_version"])
+    return None
+
+
+def fragmentos_detalles(detalles, fecha_str: str, personal_id: str) -> dict:
+    """
+    {tarea_id: Markup} con el bloque de fracciones de cada detalle.
+    Cada bloque se renderiza una vez por (SOP o evento, nivel, versión) y se
+    reutiliza entre tareas, personas y días; aquí solo se sustituyen las marcas.
+    """
+    fecha_q = str(escape(quote(fecha_str, safe="")))
+    personal_q = str(escape(quote(str(personal_id), safe="")))
+
+    fragmentos = {}
+    for d in detalles:
+        llave = _llave_fragmento(d)
+        html = lru_get(_fragmentos, _fragmentos_lock, llave) if llave else None
+        if html is None:
+            html = render_template("reportes/_fracciones_tarea.html", d=d, marcas=_MARCAS)
+            if llave:
+                lru_put(_fragmentos, _fragmentos_lock, llave, html, FRAGMENTO_CACHE_MAX)
+
+        fragmentos[d["tarea_id"]] = Markup(
+            html
+            .replace(_MARCAS["fecha"], fecha_q)
+            .replace(_MARCAS["personal_id"], personal_q)
+            .replace(_MARCAS["tarea_id"], str(d["tarea_id"]))
+        )
+    return fragmentos
+
+
+# =========================
+# Huella (ETag) por día y persona
+# =========================
+def _filas_dia_persona(dia_id: int, personal_id: str):
+    """
+    Filas planas de las tareas de una persona en un día (con nombres de
+    área/subárea, check y SOP regular de respaldo) y las versiones de contenido
+    de sus SOPs. Dos queries, sin grafo SOP.
+    """
+    SopRegular = aliased(SOP)
+
+    rows = (
+        db.session.query(
+            LanzamientoTarea.tarea_id,
+            LanzamientoTarea.orden,
+            LanzamientoTarea.tipo_tarea,
+            LanzamientoTarea.sop_id,
+            LanzamientoTarea.sop_evento_id,
+            LanzamientoTarea.nivel_limpieza_asignado,
+            LanzamientoTarea.es_adicional,
+            LanzamientoTarea.area_id,
+            LanzamientoTarea.subarea_id,
+            Personal.nombre,
+            Area.area_nombre,
+            Area.orden_area,
+            SubArea.subarea_nombre,
+            SubArea.orden_subarea,
+            TareaCheck.checked_at,
+            SopRegular.sop_id.label("sop_regular_id"),
+        )
+        .outerjoin(Personal, Personal.personal_id == LanzamientoTarea.personal_id)
+        .outerjoin(Area, Area.area_id == LanzamientoTarea.area_id)
+        .outerjoin(SubArea, SubArea.subarea_id == LanzamientoTarea.subarea_id)
+        .outerjoin(TareaCheck, TareaCheck.tarea_id == LanzamientoTarea.tarea_id)
+        .outerjoin(SopRegular, and_(
+            LanzamientoTarea.sop_id.is_(None),
+            SopRegular.subarea_id == LanzamientoTarea.subarea_id,
+            SopRegular.tipo_sop == "regular",
+        ))
+        .filter(LanzamientoTarea.dia_id == dia_id, LanzamientoTarea.personal_id == personal_id)
+        .order_by(LanzamientoTarea.tarea_id, SopRegular.sop_id)
+        .all()
+    )
+
+    claves = set()
+    for r in rows:
+        claves.update(_claves_version_fila(r))
+    return rows, obtener_versiones(claves)
+
+
+def _claves_version_fila(r):
+    claves = []
+    sop_id = r.sop_id or r.sop_regular_id
+    if sop_id:
+        claves.append(clave_sop(sop_id))
+    if r.sop_evento_id:
+        claves.append(clave_sop_evento(r.sop_evento_id))
+    return claves
+
+
+def huella_dia_persona(dia_id: int, personal_id: str) -> str:
+    """
+    Huella del contenido del día de una persona: filas de tareas (orden, SOP,
+    nivel, área/subárea), checks y versiones de contenido de sus SOPs.
+    Dos queries y ningún grafo SOP; cambia si cambia cualquier cosa visible.
+    """
+    rows, versiones = _filas_dia_persona(dia_id, personal_id)
+
+    h = hashlib.sha1()
+    h.update(repr([tuple(r) for r in rows]).encode("utf-8"))
+    h.update(repr(sorted(versiones.items())).encode("utf-8"))
+    return h.hexdigest()
+
+
+# =========================
+# Reporte compacto (API JSON con delta)
+# =========================
+API_REPORTE_VERSION = 1
+
+# Campos de la fila que NO forman parte del "contenido" de la tarea
+_CAMPOS_FUERA_DE_CONTENIDO = ("orden", "checked_at")
+
+
+def _hash_corto(valor, n: int = 8) -> str:
+    return hashlib.sha1(repr(valor).encode("utf-8")).hexdigest()[:n]
+
+
+def _estado_tareas(rows, versiones) -> dict:
+    """{tarea_id: (hash_contenido, orden, hash_check)} a partir de las filas planas."""
+    estado = {}
+    for r in rows:
+        datos = r._asdict()
+        for campo in _CAMPOS_FUERA_DE_CONTENIDO:
+            datos.pop(campo)
+        contenido = (
+            sorted(datos.items()),
+            [versiones.get(c, 0) for c in _claves_version_fila(r)],
+            versiones.get(CLAVE_CATALOGO, 0),
+        )
+        check = r.checked_at.strftime("%H:%M") if r.checked_at else None
+        estado[r.tarea_id] = (_hash_corto(contenido), r.orden or 0, _hash_corto(check, 4))
+    return estado
+
+
+def _token(dia_id: int, estado: dict) -> str:
+    partes = ",".join(f"{tid}:{hc}:{orden}:{hk}" for tid, (hc, orden, hk) in sorted(estado.items()))
+    raw = f"{API_REPORTE_VERSION}|{dia_id}|{partes}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _leer_token(token: str, dia_id: int):
+    """Estado codificado en el token, o None si es inválido / de otra versión o día."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("utf-8")
+        version, dia, partes = raw.split("|", 2)
+        if int(version) != API_REPORTE_VERSION or int(dia) != dia_id:
+            return None
+        estado = {}
+        for item in filter(None, partes.split(",")):
+            tid, hc, orden, hk = item.split(":")
+            estado[int(tid)] = (hc, int(orden), hk)
+        return estado
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+
+
+def _llave_plan(d):
+    if d.get("plan_version") is None:
+        return None
+    if d.get("sop_id") and d.get("nivel_id"):
+        return f"s:{d['sop_id']}:{d['nivel_id']}:" + ".".join(str(v) for v in d["plan_version"])
+    if d.get("sop_evento_id"):
+        return f"e:{d['sop_evento_id']}:" + ".".join(str(v) for v in d["plan_version"])
+    return None
+
+
+def _fraccion_compacta(f) -> dict:
+    c = {"n": f["nombre_full"], "t": f["tiempo_min"]}
+    pasos = (f.get("metodologia") or {}).get("pasos") or []
+    if pasos:
+        c["m"] = [p["instruccion"] for p in pasos]
+    tabla = f.get("tabla")
+    if tabla and tabla.get("rows"):
+        c["h"] = tabla["headers"]
+        c["r"] = tabla["rows"]
+    if f.get("observacion_critica"):
+        c["nota"] = f["observacion_critica"]
+    if f.get("instructivo"):
+        c["inst"] = f["instructivo"]["instructivo_id"]
+    return c
+
+
+def _visibles_sin_cargar(rows) -> set:
+    """
+    tarea_ids de `rows` que construir_detalles emitiría (las que tienen plan),
+    a partir de las filas planas. Los planes salen del cache de planes.
+    """
+    sop_de, eventos = {}, set()
+    for r in rows:
+        if r.tipo_tarea == 'sop':
+            sop_id = r.sop_id or r.sop_regular_id
+            nivel_id = nivel_to_id(canon_nivel(r.nivel_limpieza_asignado))
+            if sop_id and nivel_id and r.area_nombre is not None and r.subarea_nombre is not None:
+                sop_de[r.tarea_id] = (sop_id, nivel_id)
+        elif r.tipo_tarea == 'evento' and r.sop_evento_id:
+            eventos.add(r.sop_evento_id)
+
+    planes_sop, planes_evento = obtener_planes(set(sop_de.values()), eventos)
+    visibles = set()
+    for r in rows:
+        if r.tipo_tarea in ('inicio', 'receso'):
+            visibles.add(r.tarea_id)
+        elif r.tipo_tarea == 'sop' and sop_de.get(r.tarea_id) in planes_sop:
+            visibles.add(r.tarea_id)
+        elif r.tipo_tarea == 'evento' and r.sop_evento_id in planes_evento:
+            visibles.add(r.tarea_id)
+    return visibles
+
+
+def reporte_compacto(dia_id: int, personal_id: str, since: str = None) -> dict:
+    """
+    Día de una persona en formato compacto. Con un token `since` válido solo
+    trae lo que cambió: tareas nuevas/modificadas (con sus planes), cambios de
+    orden, cambios de check y tareas eliminadas. El contenido SOP solo se
+    carga para las tareas nuevas o modificadas.
+    """
+    rows, versiones = _filas_dia_persona(dia_id, personal_id)
+    estado = _estado_tareas(rows, versiones)
+    anterior = _leer_token(since, dia_id)
+
+    if anterior is None:
+        cambiadas = set(estado)
+        eliminadas = []
+    else:
+        cambiadas = {tid for tid, e in estado.items() if tid not in anterior or anterior[tid][0] != e[0]}
+        eliminadas = sorted(tid for tid in anterior if tid not in estado)
+
+    checks = {}
+    for r in rows:
+        checks[r.tarea_id] = r.checked_at.strftime("%H:%M") if r.checked_at else None
+
+    tareas = []
+    planes = {}
+    if cambiadas:
+        for d in construir_detalles(cargar_tareas_reporte(dia_id, personal_id, tarea_ids=cambiadas)):
+            llave = _llave_plan(d)
+            if llave and llave not in planes:
+                planes[llave] = {
+                    "obs": d["observacion_critica"],
+                    "min": d["tiempo_total_min"],
+                    "fr": [_fraccion_compacta(f) for f in d["fracciones"]],
+                }
+            tareas.append({
+                "id": d["tarea_id"],
+                "orden": d["orden"],
+                "tipo": d["tipo_tarea"],
+                "area": d["area"],
+                "subarea": d["subarea"],
+                "nivel": d["nivel"],
+                "min": d["tiempo_total_min"],
+                "adicional": d["es_adicional"],
+                "plan": llave,
+                "check": checks.get(d["tarea_id"]),
+            })
+
+    # Progreso sobre las tareas que el cliente puede ver (igual que el reporte HTML)
+    visibles = {t["id"] for t in tareas} | _visibles_sin_cargar(
+        [r for r in rows if r.tarea_id not in cambiadas]
+    )
+
+    ordenes = {}
+    checks_cambiados = {}
+    if anterior is not None:
+        for tid, (hc, orden, hk) in estado.items():
+            if tid in cambiadas or tid not in anterior:
+                continue
+            if anterior[tid][1] != orden:
+                ordenes[tid] = orden
+            if anterior[tid][2] != hk:
+                checks_cambiados[tid] = checks[tid]
+
+    return {
+        "api": API_REPORTE_VERSION,
+        "delta": anterior is not None,
+        "token": _token(dia_id, estado),
+        "tareas": tareas,
+        "planes": planes,
+        "ordenes": ordenes,
+        "checks": checks_cambiados,
+        "eliminadas": eliminadas,
+        "progreso": {
+            "total": len(visibles),
+            "completadas": sum(1 for tid in visibles if checks.get(tid)),
+        },
+    }
+
+
+# =========================
+# Paquete offline (reporte + instructivos)
+# =========================
+def paquete_offline(dia_id: int, personal_id: str) -> dict:
+    """
+    Todo lo que necesita el reporte sin conexión en un solo JSON: el reporte
+    compacto completo, el nombre del operario y los instructivos referidos
+    por sus fracciones (una query extra).
+    """
+    data = reporte_compacto(dia_id, personal_id)
+
+    inst_ids = {
+        f["inst"]
+        for plan in data["planes"].values()
+        for f in plan["fr"]
+        if f.get("inst")
+    }
+    instructivos = {}
+    if inst_ids:
+        rows = (
+            db.session.query(
+                InstructivoTrabajo.instructivo_id,
+                InstructivoTrabajo.codigo,
+                InstructivoTrabajo.instructivo_nombre,
+                InstructivoTrabajo.instructivo_url,
+            )
+            .filter(InstructivoTrabajo.instructivo_id.in_(inst_ids))
+            .all()
+        )
+        instructivos = {
+            str(r.instructivo_id): {"codigo": r.codigo, "nombre": r.instructivo_nombre, "url": r.instructivo_url}
+            for r in rows
+        }
+
+    persona = db.session.get(Personal, personal_id)
+    data.update({
+        "nombre": persona.nombre if persona else personal_id,
+        "instructivos": instructivos,
+    })
+    return data
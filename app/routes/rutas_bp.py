@@ -1,20 +1,24 @@
 # rutas_bp.py - Blueprint de rutas diarias, plan y asignaciones
 from datetime import datetime, date, timedelta
 
-from flask import Blueprint, render_template, request, redirect, url_for, jsonify, flash, abort
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify, flash, abort, make_response
 from flask_login import login_required, current_user
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
 
 from .helpers import (
     admin_required, get_monday, get_or_create_dia, canon_nivel, nivel_to_id,
-    asegurar_tareas_fijas, calcular_tiempo_tarea, today_cdmx
+    asegurar_tareas_fijas, tiempos_tareas, today_cdmx,
+    etag_condicional, aplicar_etag, version_plantillas,
 )
+from .reportes_data import huella_dia_persona
+from .carga import JORNADA_MIN, plan_reparto, aplicar_reparto, semana_operario
 from ..extensions import db
 from ..models import (
     Area, SubArea, SOP, Personal,
     LanzamientoDia, LanzamientoTarea, AsignacionPersonal,
     TareaCheck, PlantillaItem,
-    SopFraccion, SopEvento, SopEventoDetalle,
+    SopEvento, SopEventoDetalle,
     Kit, Receta,
 )
 
@@ -37,8 +41,17 @@ def mi_ruta():
 
     dia = LanzamientoDia.query.filter_by(fecha=hoy).first()
 
+    # Sin cambios desde la última vista: 304 sin cargar tareas
+    etag, no_modificado = etag_condicional(
+        "mi_ruta", current_user.get_id(), hoy_str,
+        huella_dia_persona(dia.dia_id, current_user.personal_id) if dia else "sin-dia",
+    )
+    if no_modificado:
+        return no_modificado
+
     tareas = []
     tiempo_total = 0.0
+    tiempos_por_tarea = {}
     checks_map = {}
 
     if dia:
@@ -60,26 +73,75 @@ def mi_ruta():
             checks = TareaCheck.query.filter(TareaCheck.tarea_id.in_(tarea_ids)).all()
             checks_map = {c.tarea_id: c.checked_at.strftime("%H:%M") for c in checks}
 
-        try:
-            tiempo_total = sum(float(calcular_tiempo_tarea(t)) for t in tareas)
-        except Exception:
-            tiempo_total = 0.0
+        tiempos_por_tarea = tiempos_tareas(tareas)
+        tiempo_total = sum(float(m) for m in tiempos_por_tarea.values())
 
     total_tareas = len(tareas)
     completadas = len(checks_map)
     progreso_pct = round((completadas / total_tareas * 100) if total_tareas > 0 else 0)
 
-    return render_template(
+    html = render_template(
         "rutas/mi_ruta.html",
         hoy=hoy,
         hoy_str=hoy_str,
         tareas=tareas,
+        tiempos_por_tarea=tiempos_por_tarea,
         tiempo_total=round(tiempo_total, 2),
         checks_map=checks_map,
         total_tareas=total_tareas,
         completadas=completadas,
         progreso_pct=progreso_pct,
     )
+    return aplicar_etag(html, etag)
+
+
+@rutas_bp.route("/mi_semana")
+@login_required
+def mi_semana():
+    """Tareas del operario de Lunes a Sábado de esta semana."""
+    if getattr(current_user, "role", None) == "admin":
+        return redirect(url_for("home.home_admin_panel"))
+
+    if not getattr(current_user, "personal_id", None):
+        abort(403)
+
+    hoy = today_cdmx()
+    return render_template(
+        "rutas/mi_semana.html",
+        hoy_str=hoy.strftime("%Y-%m-%d"),
+        semana=semana_operario(hoy, current_user.personal_id),
+    )
+
+
+@rutas_bp.route("/mi_ruta/offline")
+@login_required
+def mi_ruta_offline():
+    """
+    Reporte del día sin conexión: página sin datos que el service worker
+    guarda y que se arma con el paquete offline (/api/v1/paquete).
+    """
+    if getattr(current_user, "role", None) == "admin":
+        return redirect(url_for("home.home_admin_panel"))
+
+    if not getattr(current_user, "personal_id", None):
+        abort(403)
+
+    return render_template("rutas/mi_ruta_offline.html", hide_nav=True)
+
+
+@rutas_bp.route("/sw.js")
+def service_worker():
+    """Service worker del modo sin conexión (alcance: todo el sitio)."""
+    resp = make_response(render_template(
+        "rutas/sw.js",
+        version=version_plantillas(),
+        prefijo_paquete=url_for("api.api_paquete_offline", fecha="_", personal_id="_")[:-3],
+        prefijo_reporte=url_for("reportes.reporte_persona_dia", fecha="_", personal_id="_")[:-3],
+    ))
+    resp.mimetype = "application/javascript"
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["Service-Worker-Allowed"] = "/"
+    return resp
 
 
 @rutas_bp.route("/personal/<personal_id>/asignar", methods=["GET", "POST"])
@@ -265,13 +327,12 @@ def plan_dia_asignar(fecha):
             joinedload(LanzamientoTarea.personal),
             joinedload(LanzamientoTarea.area),
             joinedload(LanzamientoTarea.subarea),
-            joinedload(LanzamientoTarea.sop).selectinload(SOP.sop_fracciones).selectinload(SopFraccion.detalles),
-            joinedload(LanzamientoTarea.sop_evento).selectinload(SopEvento.detalles)
+            joinedload(LanzamientoTarea.sop_evento).joinedload(SopEvento.caso_catalogo),
         )
         .all()
     )
 
-    tiempos_por_tarea = {t.tarea_id: calcular_tiempo_tarea(t) for t in tareas_del_dia}
+    tiempos_por_tarea = tiempos_tareas(tareas_del_dia)
 
     tareas_regulares = [t for t in tareas_del_dia if not getattr(t, 'es_adicional', False)]
 
@@ -313,6 +374,67 @@ def plan_dia_asignar(fecha):
     )
 
 
+@rutas_bp.route("/plan/<fecha>/auto-asignar", methods=["POST"])
+@admin_required
+def plan_dia_auto_asignar(fecha):
+    """
+    Reparte las subáreas sin tarea regular del día entre el personal,
+    balanceando minutos contra la capacidad de cada uno.
+
+    JSON: {"nivel": "basica", "capacidad_min": 480,
+           "personal": ["P1", ...] o [{"personal_id": "P1", "capacidad_min": 300}, ...],
+           "subareas": [...] (opcional), "aplicar": false}
+    Sin "aplicar" solo regresa la propuesta.
+    """
+    try:
+        fecha_obj = datetime.strptime(fecha, "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "Fecha inválida"}), 400
+
+    data = request.get_json(silent=True) or {}
+
+    nivel = canon_nivel(data.get("nivel") or "basica")
+    if nivel not in ("basica", "media", "profundo"):
+        return jsonify({"error": "Nivel inválido (basica, media o profundo)"}), 400
+
+    try:
+        capacidad_default = float(data.get("capacidad_min") or JORNADA_MIN)
+        capacidades = {}
+        personal = data.get("personal")
+        if personal is None:
+            personal = [pid for (pid,) in db.session.query(Personal.personal_id).all()]
+        for p in personal:
+            if isinstance(p, dict):
+                capacidades[str(p["personal_id"])] = float(p.get("capacidad_min") or capacidad_default)
+            else:
+                capacidades[str(p)] = capacidad_default
+    except (TypeError, ValueError, KeyError):
+        return jsonify({"error": "Personal o capacidad inválidos"}), 400
+
+    capacidades = {pid: cap for pid, cap in capacidades.items() if cap > 0}
+    if not capacidades:
+        return jsonify({"error": "No hay personal con capacidad disponible"}), 400
+
+    subareas = data.get("subareas")
+    # La vista previa no crea el día: si no existe, no hay carga previa
+    dia = LanzamientoDia.query.filter_by(fecha=fecha_obj).first()
+    plan = plan_reparto(dia.dia_id if dia else None, nivel, capacidades, subareas)
+    plan["fecha"] = fecha
+    plan["aplicado"] = False
+
+    if data.get("aplicar"):
+        if not dia:
+            dia = get_or_create_dia(fecha_obj)
+        try:
+            plan["creadas"] = aplicar_reparto(dia.dia_id, plan)
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"error": "El plan cambió mientras se repartía, vuelve a intentar"}), 409
+        plan["aplicado"] = True
+
+    return jsonify(plan)
+
+
 @rutas_bp.route("/plan/<fecha>/ruta")
 @admin_required
 def ruta_dia(fecha):
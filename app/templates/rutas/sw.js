@@ -0,0 +1,109 @@
+// sw.js - Service worker del modo sin conexión (LuxSOP ERP)
+//
+// - Paquete del día (/api/v1/paquete/...): se responde desde el cache y se
+//   revalida en segundo plano con If-None-Match (304 si no cambió). Solo se
+//   guarda el paquete más reciente.
+// - Navegación a Mi ruta / reporte del día: red primero; sin conexión se
+//   muestra la página offline, que se arma con el paquete guardado.
+var VERSION = '{{ version }}';
+var CACHE_PAGINAS = 'luxsop-paginas-' + VERSION;
+var CACHE_PAQUETES = 'luxsop-paquetes';
+var URL_OFFLINE = '{{ url_for("rutas.mi_ruta_offline") }}';
+var URL_MI_RUTA = '{{ url_for("rutas.mi_ruta") }}';
+var PREFIJO_PAQUETE = '{{ prefijo_paquete }}';
+var PREFIJO_REPORTE = '{{ prefijo_reporte }}';
+
+self.addEventListener('install', function(e) {
+  e.waitUntil(
+    caches.open(CACHE_PAGINAS)
+      .then(function(cache) { return cache.add(new Request(URL_OFFLINE, { credentials: 'same-origin' })); })
+      .then(function() { return self.skipWaiting(); })
+  );
+});
+
+self.addEventListener('activate', function(e) {
+  e.waitUntil(
+    caches.keys().then(function(nombres) {
+      return Promise.all(nombres.filter(function(n) {
+        return n.indexOf('luxsop-paginas-') === 0 && n !== CACHE_PAGINAS;
+      }).map(function(n) { return caches.delete(n); }));
+    }).then(function() { return self.clients.claim(); })
+  );
+});
+
+function sinConexion() {
+  return new Response(JSON.stringify({ error: 'Sin conexión y sin paquete guardado' }), {
+    status: 503, headers: { 'Content-Type': 'application/json' }
+  });
+}
+
+function avisar(url) {
+  return self.clients.matchAll().then(function(clientes) {
+    clientes.forEach(function(c) { c.postMessage({ tipo: 'paquete-actualizado', url: url }); });
+  });
+}
+
+// Pide el paquete al servidor con el ETag de la copia guardada
+function revalidar(cache, url, guardado) {
+  var headers = {};
+  var etag = guardado && guardado.headers.get('ETag');
+  if (etag) headers['If-None-Match'] = etag;
+
+  return fetch(url, { headers: headers, credentials: 'same-origin', cache: 'no-store' })
+    .then(function(resp) {
+      if (resp.status === 304) return guardado;
+      // Sesión vencida (redirige al login) o error: se conserva la copia
+      if (!resp.ok || resp.redirected) return guardado || resp;
+
+      return cache.put(url, resp.clone())
+        .then(function() { return cache.keys(); })
+        .then(function(llaves) {
+          return Promise.all(llaves.filter(function(r) { return r.url !== url; })
+            .map(function(r) { return cache.delete(r); }));
+        })
+        .then(function() { return guardado ? avisar(url) : null; })
+        .then(function() { return resp; });
+    })
+    .catch(function() { return guardado || sinConexion(); });
+}
+
+function paquete(e) {
+  var url = e.request.url;
+  return caches.open(CACHE_PAQUETES).then(function(cache) {
+    return cache.match(url).then(function(guardado) {
+      var red = revalidar(cache, url, guardado);
+      if (!guardado) return red;
+      e.waitUntil(red);
+      return guardado;
+    });
+  });
+}
+
+function navegar(e) {
+  return fetch(e.request).catch(function() {
+    return caches.match(URL_OFFLINE).then(function(r) { return r || Response.error(); });
+  });
+}
+
+self.addEventListener('fetch', function(e) {
+  if (e.request.method !== 'GET') return;
+  var url = new URL(e.request.url);
+  if (url.origin !== self.location.origin) return;
+
+  if (url.pathname.indexOf(PREFIJO_PAQUETE) === 0) {
+    e.respondWith(paquete(e));
+  } else if (e.request.mode === 'navigate' &&
+             (url.pathname === URL_MI_RUTA || url.pathname.indexOf(PREFIJO_REPORTE) === 0)) {
+    e.respondWith(navegar(e));
+  }
+});
+
+// Las páginas en línea piden guardar el paquete del día
+self.addEventListener('message', function(e) {
+  var d = e.data || {};
+  if (d.tipo !== 'precargar' || !d.url) return;
+  var url = new URL(d.url, self.location.origin).href;
+  e.waitUntil(caches.open(CACHE_PAQUETES).then(function(cache) {
+    return cache.match(url).then(function(guardado) { return revalidar(cache, url, guardado); });
+  }));
+});
@@ -0,0 +1,160 @@
+# versiones.py - Versiones de contenido SOP para invalidar caches
+#
+# Cada cambio (ORM o bulk) sobre un SOP, sus fracciones/detalles, un SOP de
+# evento o el catálogo compartido (kits, recetas, consumos, elementos, ...)
+# incrementa una fila de contenido_version dentro de la misma transacción.
+# Los caches en memoria incluyen la versión en su llave, así que todos los
+# workers de gunicorn dejan de servir entradas viejas sin coordinarse.
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.orm import Session
+
+from .models import (
+    now_cdmx, ContenidoVersion,
+    SOP, SopFraccion, SopFraccionDetalle,
+    SopEvento, SopEventoDetalle,
+    Fraccion, Metodologia, MetodologiaBase, MetodologiaBasePaso,
+    Kit, KitDetalle, Herramienta,
+    Receta, RecetaDetalle, Quimico, Consumo,
+    Elemento, ElementoSet, ElementoDetalle,
+    InstructivoTrabajo,
+    EventoCatalogo, CasoCatalogo, SopEventoFraccion,
+    MetodologiaEventoFraccion, MetodologiaEventoFraccionPaso,
+)
+
+CLAVE_CATALOGO = "catalogo"
+
+# Modelos compartidos entre SOPs: un cambio invalida todo
+MODELOS_CATALOGO = (
+    Fraccion, Metodologia, MetodologiaBase, MetodologiaBasePaso,
+    Kit, KitDetalle, Herramienta,
+    Receta, RecetaDetalle, Quimico, Consumo,
+    Elemento, ElementoSet, ElementoDetalle,
+    InstructivoTrabajo,
+    EventoCatalogo, CasoCatalogo, SopEventoFraccion,
+    MetodologiaEventoFraccion, MetodologiaEventoFraccionPaso,
+)
+
+MODELOS_SOP = (SOP, SopFraccion, SopFraccionDetalle, SopEvento, SopEventoDetalle)
+
+
+def clave_sop(sop_id: str) -> str:
+    return f"sop:{sop_id}"
+
+
+def clave_sop_evento(sop_evento_id: str) -> str:
+    return f"sop_evento:{sop_evento_id}"
+
+
+def obtener_versiones(claves) -> dict:
+    """
+    Versiones actuales de las claves pedidas (0 si nunca cambiaron).
+    Siempre incluye CLAVE_CATALOGO. Una sola query.
+    """
+    from .extensions import db
+
+    claves = set(claves or ())
+    claves.add(CLAVE_CATALOGO)
+
+    rows = db.session.execute(
+        select(ContenidoVersion.clave, ContenidoVersion.version)
+        .where(ContenidoVersion.clave.in_(claves))
+    ).all()
+
+    versiones = {c: 0 for c in claves}
+    versiones.update({r.clave: r.version for r in rows})
+    return versiones
+
+
+# =========================
+# Incremento
+# =========================
+def _incrementar(connection, claves):
+    """Incrementa (o crea en 1) la versión de cada clave en la conexión dada."""
+    ahora = now_cdmx()
+    dialecto = connection.dialect.name
+
+    for clave in sorted(claves):
+        if dialecto in ("postgresql", "sqlite"):
+            if dialecto == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+            stmt = dialect_insert(ContenidoVersion).values(clave=clave, version=1, actualizado_en=ahora)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ContenidoVersion.clave],
+                set_={"version": ContenidoVersion.version + 1, "actualizado_en": ahora},
+            )
+            connection.execute(stmt)
+            continue
+
+        res = connection.execute(
+            update(ContenidoVersion)
+            .where(ContenidoVersion.clave == clave)
+            .values(version=ContenidoVersion.version + 1, actualizado_en=ahora)
+        )
+        if res.rowcount == 0:
+            connection.execute(insert(ContenidoVersion).values(clave=clave, version=1, actualizado_en=ahora))
+
+
+def _claves_de_objetos(session, objetos) -> set:
+    claves = set()
+    sf_ids_pendientes = set()
+
+    for obj in objetos:
+        if isinstance(obj, MODELOS_CATALOGO):
+            claves.add(CLAVE_CATALOGO)
+        elif isinstance(obj, SOP):
+            claves.add(clave_sop(obj.sop_id))
+        elif isinstance(obj, SopFraccion):
+            claves.add(clave_sop(obj.sop_id))
+        elif isinstance(obj, SopFraccionDetalle):
+            sf = obj.__dict__.get("sop_fraccion")
+            if sf is not None and sf.sop_id:
+                claves.add(clave_sop(sf.sop_id))
+            elif obj.sop_fraccion_id:
+                sf_ids_pendientes.add(obj.sop_fraccion_id)
+        elif isinstance(obj, SopEvento):
+            claves.add(clave_sop_evento(obj.sop_evento_id))
+        elif isinstance(obj, SopEventoDetalle):
+            claves.add(clave_sop_evento(obj.sop_evento_id))
+
+    if sf_ids_pendientes:
+        rows = session.connection().execute(
+            select(SopFraccion.sop_fraccion_id, SopFraccion.sop_id)
+            .where(SopFraccion.sop_fraccion_id.in_(sf_ids_pendientes))
+        ).all()
+        encontrados = {r.sop_fraccion_id for r in rows}
+        claves.update(clave_sop(r.sop_id) for r in rows)
+        # SopFraccion ya borrada en este flush: sin forma de saber el SOP
+        if sf_ids_pendientes - encontrados:
+            claves.add(CLAVE_CATALOGO)
+
+    return claves
+
+
+@event.listens_for(Session, "after_flush")
+def _versionar_flush(session, flush_context):
+    objetos = [
+        obj for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, MODELOS_CATALOGO + MODELOS_SOP)
+    ]
+    if not objetos:
+        return
+
+    claves = _claves_de_objetos(session, objetos)
+    if claves:
+        _incrementar(session.connection(), claves)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _versionar_bulk(orm_execute_state):
+    """Query.update()/delete() no pasan por flush: invalidar por clase."""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or not issubclass(mapper.class_, MODELOS_CATALOGO + MODELOS_SOP):
+        return
+
+    _incrementar(orm_execute_state.session.connection(), {CLAVE_CATALOGO})